@@ -0,0 +1,90 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+# 기본 추출 대상 계정
+TARGET_ACCOUNTS = ["자본총계", "부채총계", "매출액", "영업이익"]
+
+# "(단위: 천원)" 같은 단위 표기 → 원 단위 배수
+UNIT_SCALES = {"원": 1, "천원": 1_000, "백만원": 1_000_000, "억원": 100_000_000}
+UNIT_PATTERN = r"단\s*위\s*[:：]\s*(?P<unit>백만원|천원|억원|원)"
+
+# 값: 1,234 / -1,234 / (1,234) (괄호는 음수)
+VALUE_PATTERN = r"(?P<value>\(?-?\d[\d,]*\)?)"
+
+# 계정명과 값 사이에 허용하는 문자 (공백, 콜론)
+DEFAULT_GAP = r"[\s:：]*"
+
+AccountMatch = namedtuple("AccountMatch", ["account", "value", "raw", "unit", "page", "pos"])
+
+
+def parse_amount(raw, scale=1):
+    """'(1,234)' → -1234 * scale"""
+    negative = raw.startswith("(") or raw.startswith("-")
+    digits = re.sub(r"[^\d]", "", raw)
+    value = int(digits) * scale
+    return -value if negative else value
+
+
+def compact(text):
+    """글자 사이 공백을 모두 지운 이름 ("자 본 총 계" → "자본총계")"""
+    return re.sub(r"\s", "", text)
+
+
+def spaced_alternatives(words):
+    """글자 사이 공백을 허용하는 정규식 대안 목록. 긴 이름을 먼저 두어 짧은 이름에 가려지지 않게 한다."""
+    ordered = sorted(words, key=len, reverse=True)
+    return "|".join(r"\s*".join(map(re.escape, word)) for word in ordered)
+
+
+@lru_cache(maxsize=32)
+def spaced_pattern(words):
+    """words(튜플) 중 하나와 글자 사이 공백을 무시하고 맞는 컴파일된 정규식"""
+    return re.compile(spaced_alternatives(words))
+
+
+class AccountExtractor:
+    """
+    여러 계정을 하나의 정규식으로 묶어 텍스트를 한 번만 훑으며 값을 찾는다.
+    계정명 글자 사이 공백("자 본 총 계")과 단위 표기를 함께 처리하고,
+    각 계정은 처음 나온 값을 사용한다.
+    """
+
+    def __init__(self, accounts=TARGET_ACCOUNTS, gap=DEFAULT_GAP):
+        self.accounts = list(accounts)
+        self._by_compact_name = {compact(account): account for account in self.accounts}
+        # 긴 이름을 먼저 두어야 "영업이익률" 같은 계정이 "영업이익"에 가려지지 않는다
+        alternatives = spaced_alternatives(self.accounts)
+        self.pattern = re.compile(rf"{UNIT_PATTERN}|(?P<account>{alternatives}){gap}{VALUE_PATTERN}")
+
+    def extract(self, pages):
+        """
+        pages: 텍스트 하나 또는 [(페이지 번호, 텍스트), ...]
+        반환: {계정: AccountMatch}. value는 단위를 반영한 원 단위 int.
+        """
+        if isinstance(pages, str):
+            pages = [(None, pages)]
+
+        found = {}
+        unit = "원"
+        for page_no, text in pages:
+            for match in self.pattern.finditer(text):
+                if match.group("unit"):
+                    unit = match.group("unit")
+                    continue
+                account = self._by_compact_name[compact(match.group("account"))]
+                if account in found:
+                    continue
+                raw = match.group("value")
+                found[account] = AccountMatch(
+                    account, parse_amount(raw, UNIT_SCALES[unit]), raw, unit, page_no, match.start()
+                )
+                if len(found) == len(self.accounts):
+                    return found
+        return found
+
+
+@lru_cache(maxsize=32)
+def get_extractor(accounts=tuple(TARGET_ACCOUNTS), gap=DEFAULT_GAP):
+    """같은 계정 조합은 컴파일된 추출기를 재사용한다."""
+    return AccountExtractor(accounts, gap)
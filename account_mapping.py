@@ -0,0 +1,96 @@
+import pandas as pd
+
+# 조회 결과에 쓰는 계정 (열 순서)
+TARGET_COLUMNS = ["자본총계", "부채총계", "매출액", "영업이익"]
+
+# 대상 계정 매핑표. account_id(XBRL 표준계정)가 있으면 우선 사용하고, 없으면 account_nm(공백 제거)으로 찾는다.
+# priority가 작은 행이 먼저 선택된다 (예: 손익계산서(IS) 값이 있으면 포괄손익계산서(CIS)보다 우선).
+ACCOUNT_MAP = pd.DataFrame([
+    # target,     sj_div, account_id,                  account_nm,          priority
+    ("자본총계", "BS",  "ifrs-full_Equity",           "자본총계",           0),
+    ("부채총계", "BS",  "ifrs-full_Liabilities",      "부채총계",           0),
+    ("매출액",   "IS",  "ifrs-full_Revenue",          "매출액",             0),
+    ("매출액",   "IS",  None,                         "영업수익",           1),
+    ("매출액",   "IS",  None,                         "수익(매출액)",       2),
+    ("매출액",   "CIS", "ifrs-full_Revenue",          "매출액",             3),
+    ("매출액",   "CIS", None,                         "영업수익",           4),
+    ("매출액",   "CIS", None,                         "수익(매출액)",       5),
+    ("영업이익", "IS",  "dart_OperatingIncomeLoss",   "영업이익",           0),
+    ("영업이익", "IS",  None,                         "영업이익(손실)",     1),
+    ("영업이익", "CIS", "dart_OperatingIncomeLoss",   "영업이익",           2),
+    ("영업이익", "CIS", None,                         "영업이익(손실)",     3),
+], columns=["target", "sj_div", "account_id", "account_nm", "priority"])
+
+
+def parse_amounts(amounts):
+    """'1,234' / '-1,234' / '' / '-' 문자열 Series → Int64 (없는 값은 <NA>)"""
+    cleaned = amounts.astype("string").str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(cleaned, errors="coerce").round().astype("Int64")
+
+
+def map_accounts(items, amount_key="thstrm_amount", account_map=ACCOUNT_MAP):
+    """
+    fnlttMultiAcnt list 항목(여러 기업 분량)을 한 번에 대상 계정으로 매핑한다.
+    items: list 항목들을 합친 DataFrame (corp_code, fs_div, sj_div, account_nm, 금액 열 포함)
+    반환: (corp_code, fs_div) 인덱스, 대상 계정 열(Int64)을 가진 DataFrame
+    """
+    targets = list(dict.fromkeys(account_map["target"]))
+    if items.empty or amount_key not in items:
+        return pd.DataFrame(columns=targets, index=pd.MultiIndex.from_tuples([], names=["corp_code", "fs_div"]))
+
+    frame = items.reindex(columns=["corp_code", "fs_div", "sj_div", "account_id", "account_nm", amount_key])
+    frame = frame.assign(account_nm=frame["account_nm"].fillna("").str.replace(r"\s", "", regex=True))
+
+    by_name = frame.merge(account_map.drop(columns="account_id"), on=["sj_div", "account_nm"])
+    by_id = frame.dropna(subset=["account_id"]).merge(
+        account_map.dropna(subset=["account_id"]).drop(columns="account_nm"), on=["sj_div", "account_id"]
+    )
+    matched = pd.concat([by_id, by_name], ignore_index=True)
+    matched = matched.assign(amount=parse_amounts(matched[amount_key]))
+    matched = matched.dropna(subset=["amount"])
+
+    # 계정마다 우선순위가 가장 높은(숫자가 작은) 행 하나만 남긴다
+    matched = matched.sort_values("priority", kind="stable").drop_duplicates(["corp_code", "fs_div", "target"])
+    mapped = matched.pivot(index=["corp_code", "fs_div"], columns="target", values="amount")
+    return mapped.reindex(columns=targets).astype("Int64")
+
+
+def map_report_lists(found, amount_key="thstrm_amount", account_map=ACCOUNT_MAP):
+    """
+    fetch_report_lists 결과 {corp_code: (fs_div, list)} 전체를 DataFrame 하나로 모아 매핑한다.
+    반환: corp_code 인덱스, 보고서유형 + 대상 계정 열
+    """
+    records = [dict(item, corp_code=code, fs_div=fs_div)
+               for code, (fs_div, data_list) in found.items() for item in data_list]
+    items = pd.DataFrame.from_records(records)
+    mapped = map_accounts(items, amount_key, account_map).reset_index()
+
+    fs_divs = pd.Series({code: fs_div for code, (fs_div, _) in found.items()}, name="fs_div", dtype="object")
+    result = fs_divs.rename_axis("corp_code").reset_index().merge(mapped, on=["corp_code", "fs_div"], how="left")
+    result.insert(1, "보고서유형", result.pop("fs_div").map({"CFS": "연결", "OFS": "일반"}))
+    return result.set_index("corp_code")
+
+
+def as_numeric_targets(df):
+    """행 단위로 만든 결과 DataFrame의 계정 열을 Int64로 맞춘다 (없는 값은 <NA>)"""
+    for column in TARGET_COLUMNS:
+        if column in df:
+            df[column] = parse_amounts(df[column])
+    return df
+
+
+def assemble_results(requests_df, mapped, failures, keys):
+    """
+    요청 목록(사업자명, corp_code, keys)에 조회 결과를 붙인다.
+    mapped: 성공한 조회(keys + 보고서유형 + 계정 열), failures: 실패한 조회(keys + 조회결과 없음)
+    """
+    fetched = pd.concat([mapped, failures], ignore_index=True)
+    result = requests_df.merge(fetched, on=keys, how="left")
+    messages = result.pop("조회결과 없음").astype(object) if "조회결과 없음" in result else None
+    if messages is None:
+        messages = pd.Series(None, index=result.index, dtype=object)
+    messages[result["corp_code"].isna()] = "코드 매칭 실패"
+    result = result.drop(columns="corp_code")
+    if messages.notna().any():
+        result["조회결과 없음"] = messages
+    return result
@@ -2,41 +2,40 @@ import streamlit as st
 import pandas as pd
 import datetime
 import time
-import requests
-import zipfile
-import io
-import xml.etree.ElementTree as ET
-
-from open_dart_reader import process_corp_info, get_dart_report_data, get_corp_code
+from account_mapping import as_numeric_targets
+from audit_pipeline import run_audit_pipeline
+from batch_jobs import BatchJob, file_job_id
+from corp_registry import SNAPSHOT_FILE, get_corp_registry
+from dart_settings import (
+    DART_MAX_WORKERS,
+    DART_WEB_MAX_CONCURRENT,
+    DART_WEB_RATE_PER_MINUTE,
+    FILING_LOOKBACK_DAYS,
+    REPORT_TYPES,
+    cache_path,
+)
+from fetch_engine import fetch_concurrently
+from filing_index import get_filing_index
+from quota_tracker import get_quota_tracker
+from stage_metrics import company, get_stage_metrics, stage
+from open_dart_reader import (
+    process_corp_info,
+    get_dart_report_data,
+    iter_dart_report_data_batch,
+    iter_dart_multi_year_data,
+    to_wide_table,
+    get_corp_code
+)
 from external_audit_parser import (
-    parse_external_audit_pdf,
-    get_pdf_download_url,
+    parse_audit_filing,
     get_latest_audit_rcp_no
 )
-from external_web_audit_parser import get_latest_web_rcp_no  # ✅ 웹기반 함수 추가
-
-# ✅ 기업 리스트 캐싱 함수
-@st.cache_data(show_spinner="📦 DART 기업 리스트 불러오는 중...", ttl=3600)
-def load_corp_list(api_key):
-    corp_response = requests.get(f"https://opendart.fss.or.kr/api/corpCode.xml?crtfc_key={api_key}")
-    with zipfile.ZipFile(io.BytesIO(corp_response.content)) as z:
-        with z.open("CORPCODE.xml") as xml_file:
-            xml_data = xml_file.read().decode("utf-8")
-    root = ET.fromstring(xml_data)
-    corp_list = [
-        {"corp_code": corp.findtext("corp_code"), "corp_name": corp.findtext("corp_name")}
-        for corp in root.iter("list")
-    ]
-    return pd.DataFrame(corp_list)
-    
-# ✅ API 잔여 호출 횟수 확인 함수
-def check_dart_api_remaining(api_key):
-    url = f"https://opendart.fss.or.kr/api/corpCode.xml?crtfc_key={api_key}"
-    response = requests.get(url)  # ← GET으로 변경
-
-    remaining = response.headers.get("x-ratelimit-remaining", "알 수 없음")
-    limit = response.headers.get("x-ratelimit-limit", "알 수 없음")
-    return remaining, limit
+from external_web_audit_parser import fetch_web_audit  # ✅ 웹기반 함수 추가
+
+# ✅ 기업 리스트 레지스트리 (모든 세션이 같은 객체를 공유)
+@st.cache_resource(show_spinner="📦 DART 기업 리스트 불러오는 중...")
+def load_corp_registry(api_key):
+    return get_corp_registry(api_key)
 
 
 # ✅ 업로드 파일 읽기 함수
@@ -53,6 +52,27 @@ def read_uploaded_file(uploaded_file):
         st.error(f"❌ 파일을 읽을 수 없습니다: {e}")
         st.stop()
 
+# ✅ 이어서 하기 가능한 작업 열기 (같은 파일 + 같은 조건이면 같은 작업)
+def open_batch_job(uploaded_file, total, **params):
+    job = BatchJob(file_job_id(uploaded_file.getvalue(), **params), total, params)
+    if job.done and not job.is_complete:
+        st.info(f"🔁 이전 작업을 이어서 진행합니다 ({job.done} / {total}개 완료)")
+    if job.done and st.button("🗑 저장된 진행 상황 지우고 처음부터", key=f"reset_{job.job_id}"):
+        job.reset()
+    return job
+
+# ✅ 진행 중 결과 다운로드 버튼 갱신
+PARTIAL_DOWNLOAD_EVERY = 50
+
+def show_partial_download(placeholder, job, file_name, frame=None):
+    frame = job.to_frame() if frame is None else frame
+    placeholder.download_button(
+        f"⬇️ 지금까지 결과 다운로드 ({job.done} / {job.total}개)",
+        frame.to_csv(index=False),
+        file_name=file_name,
+        key=f"partial_{job.job_id}_{job.done}",
+    )
+
 # ✅ 기본 설정
 st.set_page_config(page_title="DART 재무정보 통합조회기", layout="wide")
 st.title("📊 DART 재무정보 통합조회기")
@@ -65,31 +85,44 @@ st.markdown("""
 """)
 
 api_key = st.secrets["OPEN_DART_API_KEY"]
-corp_list_df = load_corp_list(api_key)
+corp_registry = load_corp_registry(api_key)
+# ✅ 서버가 오래 떠 있어도 기업 목록이 낡지 않도록 매 실행마다 확인 (갱신 중이면 그대로 둔다)
+if corp_registry.is_stale():
+    corp_registry.refresh_in_background(api_key, cache_path(SNAPSHOT_FILE))
 
 # ✅ 메뉴 및 공통 연도 선택
 menu = st.sidebar.radio("기능 선택", ["📘 사업보고서 조회", "📕 외부감사보고서 조회", "🕸 웹기반 외감보고서 조회"])
 
 # ✅ API 호출 잔여량 표시
-remaining, limit = check_dart_api_remaining(api_key)
-if remaining == "알 수 없음":
-    st.sidebar.markdown("ℹ️ API 사용량 정보는 현재 조회되지 않습니다.")
-else:
-    st.sidebar.markdown(f"📊 **잔여 API 호출수:** {remaining} / {limit}")
+# (이미 받은 응답에서 기록한 값만 사용, 사용량 확인용 요청은 보내지 않음)
+quota = get_quota_tracker().summary()
+st.sidebar.markdown(f"📊 **잔여 API 호출수:** {quota['remaining']} / {quota['limit']}")
+st.sidebar.caption(f"오늘 호출 {quota['calls']:,}건")
+if quota["status"].get("020"):
+    st.sidebar.warning(f"⚠️ 요청 제한 초과(020) 응답 {quota['status']['020']}회")
+
+refreshed = datetime.datetime.fromtimestamp(corp_registry.saved_at).strftime("%Y-%m-%d %H:%M")
+st.sidebar.caption(f"🗂 기업 목록 v{corp_registry.version} · {len(corp_registry):,}개 · 갱신 {refreshed}")
 
 current_year = datetime.datetime.now().year
 year_options = [str(current_year - i) for i in range(3)]
 year = st.sidebar.selectbox("조회 연도", year_options, index=1, key="global_year")
+max_workers = st.sidebar.slider("동시 요청 수", 1, 16, DART_MAX_WORKERS, key="max_workers")
 
 # ✅ 보고서 유형 (1번 메뉴에서만 노출)
-report_types = {
-    "사업보고서": "11011",
-    "반기보고서": "11012",
-    "1분기보고서": "11013",
-    "3분기보고서": "11014"
-}
+report_types = REPORT_TYPES
 if menu == "📘 사업보고서 조회":
     report_type = st.sidebar.selectbox("보고서 유형", list(report_types.keys()), key="report_type")
+    batch_mode = st.sidebar.checkbox("묶음 요청 (최대 100개 기업씩 한 번에 조회)", value=True, key="batch_mode")
+    multi_year = st.sidebar.checkbox("📈 여러 연도 조회", value=False, key="multi_year")
+    if multi_year:
+        start_year, end_year = st.sidebar.select_slider(
+            "조회 기간", options=list(range(current_year - 9, current_year + 1)),
+            value=(current_year - 3, current_year - 1), key="year_range"
+        )
+        multi_report_types = st.sidebar.multiselect(
+            "보고서 유형 (여러 개 선택 가능)", list(report_types.keys()), default=[report_type], key="multi_report_types"
+        )
 else:
     report_type = "사업보고서"  # 기본값
 
@@ -108,24 +141,81 @@ if menu == "📘 사업보고서 조회":
         progress_bar = st.progress(0)
         status_text = st.empty()
         start_time = time.time()
-        results = []
 
-        for i, name in enumerate(cleaned):
-            percent = int((i + 1) / total * 100)
-            elapsed = int(time.time() - start_time)
-            remaining = int((elapsed / (i + 1)) * (total - i - 1)) if i > 0 else 0
+        if multi_year or batch_mode:
+            # 묶음(최대 100개 기업)마다 디스크에 저장하고, 재실행하면 끝나지 않은 기업부터 이어서 조회한다
+            if multi_year:
+                multi_codes = [report_types[t] for t in multi_report_types]
+                job = open_batch_job(uploaded_file, total, menu="📘", start_year=start_year, end_year=end_year,
+                                     report_types=multi_codes)
+            else:
+                job = open_batch_job(uploaded_file, total, menu="📘", year=year, report_type=report_type)
+            partial_download = st.empty()
 
-            status_text.markdown(f"🔄 진행률: **{percent}%** | 남은 기업: **{total - i - 1}개** | 예상 남은 시간: **{remaining}초**")
-            progress_bar.progress(percent)
+            def job_frame():
+                # 여러 연도 조회는 기업·보고서·연도별 행으로 저장하고 보여줄 때 펼친다
+                frame = as_numeric_targets(job.to_frame())
+                return to_wide_table(frame) if multi_year and not frame.empty else frame
+
+            pending = job.pending(list(cleaned))
+            pending_names = [name for _, name in pending]
+            if multi_year:
+                chunks = iter_dart_multi_year_data(
+                    pending_names, start_year, end_year, multi_codes, api_key, registry=corp_registry
+                )
+            else:
+                chunks = iter_dart_report_data_batch(
+                    pending_names, year, report_types[report_type], api_key, registry=corp_registry
+                )
 
             try:
-                df_result = get_dart_report_data([name], year, report_types[report_type], api_key)
-                results.extend(df_result.to_dict("records"))
+                for row_positions, chunk_df in chunks:
+                    job.record_frame([pending[j][0] for j in row_positions], chunk_df)
+
+                    percent = int(job.done / total * 100) if total else 100
+                    elapsed = int(time.time() - start_time)
+                    status_text.markdown(f"🔄 진행률: **{percent}%** | 완료한 기업: **{job.done} / {total}개** | 경과: **{elapsed}초**")
+                    progress_bar.progress(percent)
+                    show_partial_download(partial_download, job, "dart_재무정보_진행중.csv", job_frame())
             except Exception as e:
-                results.append({"사업자명": name, "조회결과 없음": str(e)})
+                st.error(f"❌ {'여러 연도' if multi_year else '묶음'} 조회 실패: {e}")
+
+            partial_download.empty()
+            result_df = job_frame()
+        else:
+            # 기업마다 디스크에 저장하고, 재실행하면 끝나지 않은 기업부터 이어서 조회한다
+            job = open_batch_job(uploaded_file, total, menu="📘", year=year, report_type=report_type)
+            partial_download = st.empty()
+
+            def fetch_one(entry):
+                _, name = entry
+                with company(name):
+                    df_result = get_dart_report_data([name], year, report_types[report_type], api_key, registry=corp_registry)
+                return df_result.to_dict("records")[0]
+
+            # 끝나는 순서대로 진행률을 갱신하고, 결과는 입력 순서대로 모은다
+            pending = job.pending(list(cleaned))
+            streamed = fetch_concurrently(fetch_one, pending, max_workers=max_workers)
+            for count, (_, (i, name), record, error) in enumerate(streamed, start=1):
+                job.record(i, record if error is None else {"사업자명": name, "조회결과 없음": str(error)})
 
-        result_df = pd.DataFrame(results)
-        st.success("✅ 전체 기업 조회 완료")
+                percent = int(job.done / total * 100)
+                elapsed = int(time.time() - start_time)
+                remaining = int((elapsed / count) * (total - job.done))
+
+                status_text.markdown(f"🔄 진행률: **{percent}%** | 남은 기업: **{total - job.done}개** | 예상 남은 시간: **{remaining}초**")
+                progress_bar.progress(percent)
+                if count % PARTIAL_DOWNLOAD_EVERY == 0:
+                    show_partial_download(partial_download, job, "dart_재무정보_진행중.csv")
+
+            partial_download.empty()
+            result_df = as_numeric_targets(job.to_frame())
+
+        if job.is_complete:
+            st.success("✅ 전체 기업 조회 완료")
+        else:
+            # 조회가 중간에 실패하면 끝난 기업만 보여주고, 재실행하면 나머지부터 이어서 조회한다
+            st.warning(f"⚠️ 일부 결과만 조회되었습니다 ({job.done} / {total}개). 다시 실행하면 끝나지 않은 기업부터 이어서 조회합니다.")
         st.dataframe(result_df)
         st.download_button("⬇️ 결과 다운로드 (CSV)", result_df.to_csv(index=False), file_name="dart_재무정보.csv")
     else:
@@ -134,39 +224,74 @@ if menu == "📘 사업보고서 조회":
 # ✅ 2. 외부감사보고서 PDF 수치 추출
 elif menu == "📕 외부감사보고서 조회":
     st.header("📕 외부감사보고서 기반 PDF 재무 수치 조회")
+
+    # 기업이 많으면 감사보고서 공시 목록을 기간 단위로 먼저 받아 두고, 기업별 조회는 로컬 색인에서 찾는다
+    filing_index = get_filing_index()
+    if filing_index is not None:
+        with st.expander(f"📚 감사보고서 공시 목록 미리 받기 (현재 {len(filing_index):,}건)"):
+            index_days = st.number_input("최근 며칠", 30, 3650, FILING_LOOKBACK_DAYS, step=30, key="index_days")
+            if st.button("목록 받기", key="build_filing_index"):
+                index_progress = st.progress(0)
+                added = filing_index.build(
+                    api_key, datetime.date.today() - datetime.timedelta(days=int(index_days)),
+                    progress_callback=lambda done, total: index_progress.progress(int(done / total * 100)),
+                )
+                st.success(f"✅ 감사보고서 공시 {added:,}건 저장")
+
     uploaded_file = st.file_uploader("📂 기업명 파일 업로드 (CSV 또는 Excel)", type=["csv", "xlsx"])
     if uploaded_file:
         df = read_uploaded_file(uploaded_file)
         cleaned_names, _ = process_corp_info(df)
         st.write("🧹 정제된 기업명 (최대 5개):", cleaned_names[:5].tolist())
+        pipelined = st.checkbox("PDF 분석 병렬 처리 (다운로드와 분석을 동시에, CPU 코어 모두 사용)", value=True)
 
         total = len(cleaned_names)
+        job = open_batch_job(uploaded_file, total, menu="📕", year=year)
         progress_bar = st.progress(0)
         status_text = st.empty()
-        results = []
+        partial_download = st.empty()
+
+        def fetch_audit(name):
+            with company(name):
+                return fetch_audit_filing(name)
 
-        for i, name in enumerate(cleaned_names):
-            corp_code = get_corp_code(name, corp_list_df)
+        def fetch_audit_filing(name):
+            with stage("resolve"):
+                corp_code = get_corp_code(name, corp_registry)
             if not corp_code:
-                results.append({"사업자명": name, "오류": "기업 코드 매칭 실패"})
-                continue
+                return {"사업자명": name, "오류": "기업 코드 매칭 실패"}
 
             try:
                 rcp_no = get_latest_audit_rcp_no(corp_code, api_key)
-                pdf_url = get_pdf_download_url(rcp_no)
-                financials = parse_external_audit_pdf(pdf_url)
+                financials = parse_audit_filing(rcp_no)
             except Exception as e:
                 financials = {"오류": str(e)}
 
             result = {"사업자명": name}
             result.update(financials)
-            results.append(result)
+            return result
 
-            percent = int((i + 1) / total * 100)
-            status_text.markdown(f"🔄 진행률: **{percent}%** | 남은 기업: **{total - i - 1}개**")
+        # 끝나지 않은 기업만 조회하고, 끝날 때마다 디스크에 기록한다
+        pending = job.pending(list(cleaned_names))
+        pending_names = [name for _, name in pending]
+        if pipelined:
+            streamed = (
+                (j, name, result, None)
+                for j, name, result in run_audit_pipeline(pending_names, corp_registry, api_key, max_workers=max_workers)
+            )
+        else:
+            streamed = fetch_concurrently(fetch_audit, pending_names, max_workers=max_workers)
+        for count, (j, name, result, error) in enumerate(streamed, start=1):
+            job.record(pending[j][0], result if error is None else {"사업자명": name, "오류": str(error)})
+
+            percent = int(job.done / total * 100)
+            status_text.markdown(f"🔄 진행률: **{percent}%** | 남은 기업: **{total - job.done}개**")
             progress_bar.progress(percent)
+            if count % PARTIAL_DOWNLOAD_EVERY == 0:
+                show_partial_download(partial_download, job, "외감보고서_재무정보_진행중.csv")
 
-        result_df = pd.DataFrame(results)
+        partial_download.empty()
+        result_df = job.to_frame()
         st.success("✅ 외부감사보고서 조회 완료")
         st.dataframe(result_df)
         st.download_button("⬇️ 결과 다운로드 (CSV)", result_df.to_csv(index=False), file_name="외감보고서_재무정보.csv")
@@ -177,63 +302,50 @@ elif menu == "📕 외부감사보고서 조회":
 elif menu == "🕸 웹기반 외감보고서 조회":
     st.header("🕸 웹 기반 외부감사보고서 수치 조회")
     st.info("웹 기반 외감보고서는 일부 기업만 지원되며, 추후 더 많은 기업 지원 예정입니다.")
+    st.caption(
+        f"dart.fss.or.kr에는 분당 {DART_WEB_RATE_PER_MINUTE}회, 동시 {DART_WEB_MAX_CONCURRENT}개까지만 요청하고 "
+        f"검색 결과는 캐시해 다시 요청하지 않습니다."
+    )
+
+    uploaded_file = st.file_uploader("📂 기업명 파일 업로드 (CSV 또는 Excel)", type=["csv", "xlsx"])
+    if uploaded_file:
+        df = read_uploaded_file(uploaded_file)
+        cleaned, _ = process_corp_info(df)
+        st.write("🧹 정제된 기업명 (최대 5개):", cleaned[:5].tolist())
+
+        total = len(cleaned)
+        job = open_batch_job(uploaded_file, total, menu="🕸")
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+        partial_download = st.empty()
+
+        pending = job.pending(list(cleaned))
+        streamed = fetch_concurrently(fetch_web_audit, [name for _, name in pending], max_workers=max_workers)
+        for count, (j, name, result, error) in enumerate(streamed, start=1):
+            job.record(pending[j][0], result if error is None else {"사업자명": name, "오류": str(error)})
+
+            percent = int(job.done / total * 100)
+            status_text.markdown(f"🔄 진행률: **{percent}%** | 남은 기업: **{total - job.done}개**")
+            progress_bar.progress(percent)
+            if count % PARTIAL_DOWNLOAD_EVERY == 0:
+                show_partial_download(partial_download, job, "웹기반_외감보고서_결과_진행중.csv")
 
-   # uploaded_file = st.file_uploader("📂 기업명 파일 업로드 (CSV 또는 Excel)", type=["csv", "xlsx"])
-   # if uploaded_file:
-   #     df = read_uploaded_file(uploaded_file)
- 
-   #       cleaned, _ = process_corp_info(df)
- 
-   #       st.write("🧹 정제된 기업명 (최대 5개):", cleaned[:5].tolist())
-
-   #
- 
-   #       results = []
- 
-   #       for i, name in enumerate(cleaned[:5]):
-  
-   #          corp_code = get_corp_code(name, corp_list_df)
-   
-   #         if not corp_code:
-   
-   #             results.append({"사업자명": name, "오류": "기업 코드 매칭 실패"})
-   
-   #             continue
-   
-   #         try:
-   
-   #             rcp_no = get_latest_web_rcp_no(name)
-    
-   #            if not rcp_no:
-    
-   #                raise ValueError("웹에서 외부감사보고서를 찾을 수 없습니다.")
-   
-   #             pdf_url = get_pdf_download_url(rcp_no)
-     
-   #           financials = parse_external_audit_pdf(pdf_url)
-    
-   #        except Exception as e:
-     
-   #           financials = {"오류": str(e)}
-
-    
-   #        result = {"사업자명": name}
-    
-   #        result.update(financials)
-    
-   #        results.append(result)
-    
-   #        st.write(f"✅ {name} 처리 완료")
-
-    
-   #    result_df = pd.DataFrame(results)
-   
-   #     st.success("✅ 웹기반 외감보고서 조회 완료")
-  
-   #      st.dataframe(result_df)
-   
-   #     st.download_button("⬇️ 결과 다운로드 (CSV)", result_df.to_csv(index=False), file_name="웹기반_외감보고서_결과.csv")
-
-   #    else:
- 
-   #       st.info("📎 CSV 또는 Excel 파일을 업로드해 주세요.")
+        partial_download.empty()
+        result_df = job.to_frame()
+        st.success("✅ 웹기반 외감보고서 조회 완료")
+        st.dataframe(result_df)
+        st.download_button("⬇️ 결과 다운로드 (CSV)", result_df.to_csv(index=False), file_name="웹기반_외감보고서_결과.csv")
+    else:
+        st.info("📎 CSV 또는 Excel 파일을 업로드해 주세요.")
+
+# ✅ 단계별 소요 시간 (이 서버 프로세스에서 처리한 전체 기업 기준, 조회가 끝난 뒤 갱신)
+stage_metrics = get_stage_metrics()
+with st.sidebar.expander("⏱ 단계별 소요 시간"):
+    stage_summary = stage_metrics.summary()
+    if stage_summary.empty:
+        st.caption("아직 기록된 조회가 없습니다.")
+    else:
+        st.dataframe(stage_summary, hide_index=True)
+        st.download_button("⬇️ 기업·단계별 기록 (CSV)", stage_metrics.to_csv(), file_name="dart_단계별_기록.csv")
+        if st.button("🗑 기록 초기화", key="reset_stage_metrics"):
+            stage_metrics.reset()
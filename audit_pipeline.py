@@ -0,0 +1,140 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from account_extractor import TARGET_ACCOUNTS
+from dart_settings import DART_MAX_WORKERS
+from external_audit_parser import (
+    extract_financials_from_text,
+    extract_pages_and_financials,
+    get_latest_audit_rcp_no,
+    load_audit_pdf,
+)
+from fetch_engine import fetch_concurrently
+from filing_cache import get_filing_cache
+from open_dart_reader import get_corp_code
+from stage_metrics import company, get_stage_metrics, stage
+
+
+class AuditFetchError(Exception):
+    pass
+
+
+def download_audit_pdf(name, registry, api_key, accounts=TARGET_ACCOUNTS, cache=None):
+    """
+    네트워크 단계: 기업명 → 기업코드 → rcp_no → PDF bytes
+    반환: (rcp_no, 캐시된 재무제표 페이지 또는 None, PDF bytes 또는 None)
+    이미 분석한 공시는 PDF를 받지 않고 캐시된 페이지를 돌려준다.
+    """
+    with stage("resolve"):
+        corp_code = get_corp_code(name, registry)
+    if not corp_code:
+        raise AuditFetchError("기업 코드 매칭 실패")
+    rcp_no = get_latest_audit_rcp_no(corp_code, api_key)
+    pages = cache.get_pages(rcp_no, accounts) if cache else None
+    if pages is not None:
+        return rcp_no, pages, None
+    return rcp_no, None, load_audit_pdf(rcp_no, cache)
+
+
+def timed_extract(pdf_bytes, accounts=TARGET_ACCOUNTS):
+    """프로세스 풀에서 실행: (분석 시간(초), (재무제표 페이지, 재무 수치))"""
+    started = time.perf_counter()
+    result = extract_pages_and_financials(pdf_bytes, accounts)
+    return time.perf_counter() - started, result
+
+
+# ✅ PDF 분석용 프로세스 풀 (실행마다 새로 띄우지 않고 프로세스 전체에서 공유)
+# 다운로드·서버 스레드가 도는 중에 fork하면 자식이 잠긴 락을 물려받아 멈출 수 있으므로 forkserver(없으면 spawn)로 띄운다
+PARSE_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+_parse_pools = {}
+_parse_pools_lock = threading.Lock()
+
+
+def get_parse_pool(parse_workers=None):
+    """반환: (프로세스 풀, 한 번에 맡겨 둘 분석 수 상한)"""
+    workers = parse_workers or os.cpu_count() or 1
+    with _parse_pools_lock:
+        pool = _parse_pools.get(workers)
+        if pool is None or getattr(pool, "_broken", False):
+            pool = _parse_pools[workers] = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context(PARSE_START_METHOD)
+            )
+        return pool, workers * 2
+
+
+def run_audit_pipeline(names, registry, api_key, max_workers=DART_MAX_WORKERS, parse_workers=None,
+                       accounts=TARGET_ACCOUNTS):
+    """
+    외부감사보고서 일괄 조회 파이프라인.
+    다운로드는 스레드 풀(fetch_concurrently)에서, PDF 분석은 프로세스 풀에서 동시에 진행한다.
+    끝나는 순서대로 (입력 순번, 기업명, 결과 dict)를 돌려준다.
+    같은 공시(rcp_no)는 분석 중이면 다시 분석하지 않고 결과를 나눠 쓴다.
+    parse_workers=None이면 CPU 코어 수만큼 프로세스를 쓴다 (get_parse_pool).
+    """
+    cache = get_filing_cache()
+    metrics = get_stage_metrics()
+
+    def download(name):
+        with company(name):
+            return download_audit_pdf(name, registry, api_key, accounts, cache)
+
+    def finish(name, rcp_no, future):
+        result = {"사업자명": name}
+        try:
+            seconds, (pages, financials) = future.result()
+        except Exception as e:
+            metrics.record("parse", company=name, error=str(e)[:200])
+            result["오류"] = str(e)
+            return result
+        metrics.record("parse", company=name, seconds=seconds)
+        if cache:
+            cache.put_pages(rcp_no, accounts, pages)
+        result.update(financials)
+        return result
+
+    parse_pool, parse_limit = get_parse_pool(parse_workers)
+    parsing = {}  # future → [(입력 순번, 기업명, rcp_no), ...]
+    parsing_by_rcp = {}
+
+    def finished_parses(block=False):
+        if block and parsing:
+            wait(parsing, return_when=FIRST_COMPLETED)
+        for future in [f for f in parsing if f.done()]:
+            for entry in parsing.pop(future):
+                parsing_by_rcp.pop(entry[2], None)
+                yield entry, future
+
+    try:
+        for i, name, fetched, error in fetch_concurrently(download, names, max_workers=max_workers):
+            if error is not None:
+                yield i, name, {"사업자명": name, "오류": str(error)}
+            else:
+                rcp_no, pages, pdf_bytes = fetched
+                if pages is not None:
+                    result = {"사업자명": name}
+                    with stage("parse", company=name) as event:
+                        event["cache_hits"] += 1
+                        result.update(extract_financials_from_text(pages, accounts))
+                    yield i, name, result
+                elif rcp_no in parsing_by_rcp:
+                    parsing[parsing_by_rcp[rcp_no]].append((i, name, rcp_no))
+                else:
+                    future = parse_pool.submit(timed_extract, pdf_bytes, accounts)
+                    parsing[future] = [(i, name, rcp_no)]
+                    parsing_by_rcp[rcp_no] = future
+
+            # 다운로드를 기다리는 동안 끝난 분석 결과부터 내보낸다.
+            # 분석이 밀리면 PDF가 메모리에 쌓이지 않도록 자리가 날 때까지 다운로드 결과를 더 받지 않는다
+            for (j, parsed_name, rcp_no), future in finished_parses(block=len(parsing) >= parse_limit):
+                yield j, parsed_name, finish(parsed_name, rcp_no, future)
+
+        while parsing:
+            for (j, parsed_name, rcp_no), future in finished_parses(block=True):
+                yield j, parsed_name, finish(parsed_name, rcp_no, future)
+    finally:
+        # 중간에 멈추면(Streamlit 재실행 등) 아직 시작하지 않은 분석은 취소한다. 프로세스 풀은 다음 실행이 다시 쓴다
+        for future in parsing:
+            future.cancel()
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from dart_settings import cache_path
+
+JOBS_DIR = "jobs"
+
+
+def file_job_id(file_bytes, **params):
+    """업로드 파일 내용 + 조회 조건으로 작업 ID를 만든다. 같은 파일·조건이면 같은 작업을 이어서 한다."""
+    digest = hashlib.sha256(file_bytes)
+    digest.update(json.dumps(params, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def _to_json(value):
+    if value is None or value is pd.NA or (isinstance(value, float) and value != value):
+        return None
+    if hasattr(value, "item"):  # numpy 숫자
+        return value.item()
+    return str(value)
+
+
+class BatchJob:
+    """
+    디스크에 저장되는 일괄 조회 작업.
+    기업 하나가 끝날 때마다 results.jsonl에 한 줄씩 추가하므로,
+    새로고침이나 재실행, 프로세스 종료 후에도 끝난 기업은 다시 조회하지 않는다.
+    """
+
+    def __init__(self, job_id, total, params=None):
+        self.job_id = job_id
+        self.total = total
+        self.results_path = cache_path(JOBS_DIR, job_id, "results.jsonl")
+        self.meta_path = cache_path(JOBS_DIR, job_id, "meta.json")
+        self._lock = threading.Lock()
+        self.results = self._load()
+
+        meta = {"job_id": job_id, "total": total, "params": params or {}, "updated_at": time.time()}
+        with open(self.meta_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def _load(self):
+        results = {}
+        if not os.path.exists(self.results_path):
+            return results
+        with open(self.results_path, encoding="utf-8") as f:
+            content = f.read()
+
+        # 중단되면서 마지막 줄이 잘렸으면 잘린 부분을 지워야 다음 기록이 이어 붙지 않는다
+        if content and not content.endswith("\n"):
+            content = content[:content.rfind("\n") + 1]
+            with open(self.results_path, "w", encoding="utf-8") as f:
+                f.write(content)
+
+        for line in content.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            results[entry["index"]] = entry["result"]
+        return results
+
+    @property
+    def done(self):
+        return len(self.results)
+
+    @property
+    def is_complete(self):
+        return self.done >= self.total
+
+    def pending(self, items):
+        """아직 끝나지 않은 (순번, 항목) 목록"""
+        return [(i, item) for i, item in enumerate(items) if i not in self.results]
+
+    def record(self, index, result):
+        """기업 하나의 결과를 바로 디스크에 기록한다."""
+        line = json.dumps({"index": index, "result": result}, ensure_ascii=False, default=_to_json)
+        with self._lock:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self.results[index] = json.loads(line)["result"]
+
+    def record_frame(self, row_positions, frame):
+        """
+        묶음 조회 결과를 한 번에 기록한다. row_positions는 frame 각 행의 입력 순번.
+        한 순번에 여러 행이 있으면(여러 연도 조회 등) 그 행 목록을 한 결과로 기록한다.
+        """
+        rows = {}
+        for i, row in zip(row_positions, frame.to_dict("records")):
+            rows.setdefault(i, []).append(row)
+        lines = [
+            json.dumps({"index": i, "result": group[0] if len(group) == 1 else group},
+                       ensure_ascii=False, default=_to_json)
+            for i, group in rows.items()
+        ]
+        with self._lock:
+            with open(self.results_path, "a", encoding="utf-8") as f:
+                f.writelines(line + "\n" for line in lines)
+            for line in lines:
+                entry = json.loads(line)
+                self.results[entry["index"]] = entry["result"]
+
+    def to_frame(self):
+        """지금까지 끝난 결과를 입력 순서대로 DataFrame으로 반환 (진행 중에도 사용 가능)"""
+        with self._lock:
+            rows = []
+            for i in sorted(self.results):
+                result = self.results[i]
+                rows.extend(result if isinstance(result, list) else [result])
+        return pd.DataFrame(rows)
+
+    def reset(self):
+        with self._lock:
+            if os.path.exists(self.results_path):
+                os.remove(self.results_path)
+            self.results = {}
@@ -0,0 +1,170 @@
+"""
+Streamlit 없이 실행하는 일괄 조회기 (cron, 여러 프로세스/서버 분산용)
+
+예)
+    python batch_runner.py 기업목록.xlsx --mode report --year 2023 --report 사업보고서 -o 결과.csv
+    python batch_runner.py 기업목록.csv --mode audit --shard 0/4      # 4개로 나눈 것 중 첫 번째
+
+API 키는 --api-key 또는 환경변수 OPEN_DART_API_KEY로 넘긴다.
+"""
+import argparse
+import datetime
+import os
+import sys
+
+import pandas as pd
+
+from account_mapping import as_numeric_targets
+from audit_pipeline import run_audit_pipeline
+from batch_jobs import BatchJob, file_job_id
+from corp_registry import get_corp_registry
+from dart_settings import DART_MAX_WORKERS, REPORT_TYPES
+from external_web_audit_parser import fetch_web_audit
+from fetch_engine import fetch_concurrently
+from filing_index import get_filing_index
+from open_dart_reader import get_dart_report_data_batch, iter_dart_report_data_batch, process_corp_info
+from stage_metrics import get_stage_metrics
+
+# 실행 모드 (앱 메뉴와 같은 이름/이모지도 허용)
+MODES = {
+    "report": "report", "📘": "report",
+    "audit": "audit", "📕": "audit",
+    "web": "web", "🕸": "web",
+}
+
+
+def read_name_file(path):
+    """기업명 파일 읽기 (첫 번째 열 사용). 앱의 read_uploaded_file과 같은 규칙"""
+    if path.endswith("csv"):
+        try:
+            return pd.read_csv(path, encoding="utf-8")
+        except UnicodeDecodeError:
+            return pd.read_csv(path, encoding="cp949")
+    return pd.read_excel(path)
+
+
+def parse_shard(value):
+    """'i/n' → (i, n). i는 0부터 시작"""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError("--shard는 i/n 형식이어야 합니다 (예: 0/4)")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError("--shard i/n 에서 0 <= i < n 이어야 합니다")
+    return index, count
+
+
+def select_shard(names, shard):
+    """입력 순번 기준 i번째 조각만 남긴다 (순번 % n == i)"""
+    index, count = shard
+    return [name for position, name in enumerate(names) if position % count == index]
+
+
+def run_batch(names, mode, year, report_type, api_key, registry=None, max_workers=DART_MAX_WORKERS,
+              job=None, progress=None):
+    """
+    기업명 목록을 조회해 DataFrame으로 반환한다.
+    job(BatchJob)을 넘기면 📘 모드는 묶음마다, 📕/🕸 모드는 기업마다 기록하고 끝나지 않은 기업만 조회한다.
+    progress(완료 수, 전체 수)로 진행률을 알린다.
+    """
+    mode = MODES[mode]
+    if registry is None and mode != "web":
+        registry = get_corp_registry(api_key)
+
+    pending = job.pending(names) if job else list(enumerate(names))
+    if mode == "report":
+        if not job:
+            result_df = get_dart_report_data_batch(
+                names, year, REPORT_TYPES.get(report_type, report_type), api_key,
+                registry=registry, progress_callback=progress,
+            )
+            return as_numeric_targets(result_df)
+        chunks = iter_dart_report_data_batch(
+            [name for _, name in pending], year, REPORT_TYPES.get(report_type, report_type), api_key,
+            registry=registry,
+        )
+        for row_positions, chunk_df in chunks:
+            job.record_frame([pending[j][0] for j in row_positions], chunk_df)
+            if progress:
+                progress(job.done, len(names))
+        return as_numeric_targets(job.to_frame())
+
+    results = {}
+    pending_names = [name for _, name in pending]
+    if mode == "audit":
+        streamed = (
+            (j, name, result, None)
+            for j, name, result in run_audit_pipeline(pending_names, registry, api_key, max_workers=max_workers)
+        )
+    else:
+        streamed = fetch_concurrently(fetch_web_audit, pending_names, max_workers=max_workers)
+
+    for j, name, result, error in streamed:
+        result = result if error is None else {"사업자명": name, "오류": str(error)}
+        results[pending[j][0]] = result
+        if job:
+            job.record(pending[j][0], result)
+        if progress:
+            progress(job.done if job else len(results), len(names))
+    if job:
+        return job.to_frame()
+    return pd.DataFrame([results[i] for i in sorted(results)])
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="DART 재무정보 일괄 조회 (Streamlit 없이 실행)")
+    parser.add_argument("name_file", help="기업명 CSV 또는 Excel 파일 (첫 번째 열)")
+    parser.add_argument("--mode", choices=sorted(MODES), default="report",
+                        help="report(📘 사업보고서) / audit(📕 외부감사보고서) / web(🕸 웹기반 외감보고서)")
+    parser.add_argument("--year", default=str(datetime.date.today().year - 1), help="조회 연도 (기본: 작년)")
+    parser.add_argument("--report", default="사업보고서", choices=list(REPORT_TYPES), help="보고서 유형 (report 모드)")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="i/n: 입력을 n개로 나눈 것 중 i번째만 처리")
+    parser.add_argument("--workers", type=int, default=DART_MAX_WORKERS, help="동시 요청 수")
+    parser.add_argument("--api-key", default=os.environ.get("OPEN_DART_API_KEY"), help="OpenDART API 키")
+    parser.add_argument("-o", "--output", help="결과 CSV 경로 (기본: dart_<mode>_<year>_<shard>.csv)")
+    parser.add_argument("--index-days", type=int,
+                        help="audit 모드: 조회 전에 최근 N일의 감사보고서 공시 목록을 한꺼번에 받아 로컬 색인에 저장")
+    parser.add_argument("--metrics", help="기업·단계별 소요 시간 기록을 저장할 CSV 경로")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    mode = MODES[args.mode]
+    if mode != "web" and not args.api_key:
+        print("❌ API 키가 없습니다. --api-key 또는 OPEN_DART_API_KEY를 지정하세요.", file=sys.stderr)
+        return 2
+
+    cleaned, _ = process_corp_info(read_name_file(args.name_file))
+    names = select_shard(cleaned.tolist(), args.shard)
+    shard_label = f"{args.shard[0]}of{args.shard[1]}"
+    output = args.output or f"dart_{mode}_{args.year}_{shard_label}.csv"
+
+    with open(args.name_file, "rb") as f:
+        job_id = file_job_id(f.read(), mode=mode, year=args.year, report=args.report, shard=shard_label)
+    job = BatchJob(job_id, len(names), {"mode": mode, "year": args.year, "shard": shard_label})
+
+    def progress(done, total):
+        print(f"\r🔄 {done} / {total}", end="", file=sys.stderr, flush=True)
+
+    filing_index = get_filing_index()
+    if mode == "audit" and args.index_days and filing_index is not None:
+        added = filing_index.build(args.api_key, datetime.date.today() - datetime.timedelta(days=args.index_days))
+        print(f"📚 감사보고서 공시 {added:,}건 색인 (전체 {len(filing_index):,}건)", file=sys.stderr)
+
+    print(f"총 {len(names)}개 기업 조회 (모드: {mode}, 조각: {shard_label})", file=sys.stderr)
+    result_df = run_batch(names, mode, args.year, args.report, args.api_key,
+                          max_workers=args.workers, job=job, progress=progress)
+    result_df.to_csv(output, index=False, encoding="utf-8-sig")
+    print(f"\n✅ 저장 완료: {output} ({len(result_df)}행)", file=sys.stderr)
+
+    metrics = get_stage_metrics()
+    print(metrics.summary().to_string(index=False), file=sys.stderr)
+    if args.metrics:
+        with open(args.metrics, "w", encoding="utf-8-sig", newline="") as f:
+            f.write(metrics.to_csv())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+"""
+로컬 모의 DART 서버(dart_mock_server.py)를 띄워 📘/📕/🕸 경로의 처리 속도를 잰다.
+
+경로(모드)와 기업 수 조합마다 새 프로세스에서 빈 캐시로 실행하고 아래 값을 표로 보여준다.
+    처리량(기업/초), 기업당 지연 p50/p95, 최대 메모리(RSS), 엔드포인트별 요청 수, 오류 행 수
+
+예)
+    python benchmarks/bench_pipeline.py                                  # 10 / 1,000 / 10,000개, 세 경로 모두
+    python benchmarks/bench_pipeline.py --sizes 10 1000 --modes report audit --latency-ms 30 --rate-limit-ratio 0.01
+    python benchmarks/bench_pipeline.py --json bench.json                # 결과를 파일로 저장해 변경 전후 비교
+
+호출 제한기(DART_RATE_PER_MINUTE 등)는 기본적으로 넉넉하게 풀어 파이프라인 자체를 잰다.
+실제 한도에서의 동작을 보려면 --rate-per-minute 600 --web-rate-per-minute 120 --web-max-concurrent 2 처럼 지정한다.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# report: 📘 묶음 조회 / report-single: 📘 기업별 조회 / audit: 📕 PDF 파이프라인 / web: 🕸 웹 검색 경로
+MODES = ["report", "report-single", "audit", "web"]
+DEFAULT_MODES = ["report", "audit", "web"]
+DEFAULT_SIZES = [10, 1_000, 10_000]
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def peak_rss_mb(who=resource.RUSAGE_SELF):
+    # ru_maxrss 단위: Linux는 KB, macOS는 bytes
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def peak_rss_parse_workers_mb():
+    """
+    PDF 분석 프로세스 풀 작업자들의 최대 RSS (Linux /proc/<pid>/status의 VmHWM).
+    작업자는 측정 시점에 아직 살아 있어 RUSAGE_CHILDREN에 잡히지 않으므로 직접 읽는다. 못 읽으면 0.
+    """
+    import audit_pipeline
+
+    peak_kb = 0
+    for pool in list(audit_pipeline._parse_pools.values()):
+        for pid in list((getattr(pool, "_processes", None) or {}).keys()):
+            try:
+                with open(f"/proc/{pid}/status", encoding="ascii") as f:
+                    for line in f:
+                        if line.startswith("VmHWM:"):
+                            peak_kb = max(peak_kb, int(line.split()[1]))
+            except (OSError, ValueError):
+                continue
+    return peak_kb / 1024
+
+
+def count_errors(rows):
+    return sum(1 for row in rows if row.get("오류") or row.get("조회결과 없음"))
+
+
+# ✅ 자식 프로세스: 경로 하나를 실행하고 측정값을 JSON 한 줄로 출력
+def run_child(mode, size, workers):
+    sys.path.insert(0, REPO_DIR)
+    import audit_pipeline
+    from corp_registry import CorpRegistry, set_corp_registry
+    from dart_mock_server import corp_name_of
+    from external_web_audit_parser import fetch_web_audit
+    from fetch_engine import fetch_concurrently
+    from open_dart_reader import get_dart_report_data, get_dart_report_data_batch
+
+    api_key = "bench"
+    registry = CorpRegistry.from_api(api_key)
+    set_corp_registry(registry)
+    names = [corp_name_of(i) for i in range(size)]
+    latencies = []
+
+    def timed(func):
+        def wrapper(*args):
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                latencies.append(time.perf_counter() - started)
+        return wrapper
+
+    started = time.perf_counter()
+    if mode == "report":
+        # 묶음 조회는 기업별 지연을 따로 잴 수 없으므로, 기업이 속한 묶음의 처리 시간을 지연으로 본다
+        last = [started, 0]
+
+        def on_progress(done, total):
+            now = time.perf_counter()
+            latencies.extend([now - last[0]] * (done - last[1]))
+            last[:] = [now, done]
+
+        rows = get_dart_report_data_batch(names, "2023", "11011", api_key, registry=registry,
+                                          progress_callback=on_progress).to_dict("records")
+    elif mode == "report-single":
+        fetch_one = timed(lambda name: get_dart_report_data([name], "2023", "11011", api_key, registry=registry))
+        rows = [
+            result.to_dict("records")[0] if error is None else {"오류": str(error)}
+            for _, _, result, error in fetch_concurrently(fetch_one, names, max_workers=workers)
+        ]
+    elif mode == "audit":
+        # 다운로드 시작부터 분석 결과가 나올 때까지를 기업별 지연으로 본다
+        download_started = {}
+        download = audit_pipeline.download_audit_pdf
+
+        def download_with_start(name, *args):
+            download_started[name] = time.perf_counter()
+            return download(name, *args)
+
+        audit_pipeline.download_audit_pdf = download_with_start
+        rows = []
+        for _, name, result in audit_pipeline.run_audit_pipeline(names, registry, api_key, max_workers=workers):
+            latencies.append(time.perf_counter() - download_started.get(name, started))
+            rows.append(result)
+    else:
+        fetch_one = timed(fetch_web_audit)
+        rows = [result for _, _, result, _ in fetch_concurrently(fetch_one, names, max_workers=workers)]
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "mode": mode,
+        "companies": size,
+        "seconds": round(elapsed, 3),
+        "throughput": round(size / elapsed, 1) if elapsed else None,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "peak_rss_children_mb": round(max(peak_rss_parse_workers_mb(), peak_rss_mb(resource.RUSAGE_CHILDREN)), 1),
+        "errors": count_errors(rows),
+    }, ensure_ascii=False))
+
+
+# ✅ 부모 프로세스: 모의 서버 실행, 조합별 자식 프로세스 실행, 결과 표 출력
+def fetch_stats(base_url):
+    with urllib.request.urlopen(f"{base_url}/_stats", timeout=5) as response:
+        return json.load(response)
+
+
+def start_mock_server(args):
+    command = [
+        sys.executable, os.path.join(BENCH_DIR, "dart_mock_server.py"),
+        "--port", str(args.port), "--companies", str(max(args.sizes)),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--rate-limit-ratio", str(args.rate_limit_ratio), "--pdf-pages", str(args.pdf_pages),
+    ]
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+    for _ in range(100):
+        try:
+            fetch_stats(base_url)
+            return server, base_url
+        except OSError:
+            if server.poll() is not None:
+                raise Exception("모의 서버를 시작하지 못했습니다.")
+            time.sleep(0.1)
+    server.terminate()
+    raise Exception("모의 서버가 응답하지 않습니다.")
+
+
+def run_case(mode, size, args, base_url):
+    with tempfile.TemporaryDirectory(prefix="dart-bench-") as cache_dir:
+        env = dict(
+            os.environ,
+            PYTHONPATH=os.pathsep.join([REPO_DIR, BENCH_DIR]),
+            DART_OPEN_API_URL=f"{base_url}/api",
+            DART_WEB_URL=base_url,
+            DART_CACHE_DIR=cache_dir,
+            DART_RATE_PER_MINUTE=str(args.rate_per_minute),
+            DART_WEB_RATE_PER_MINUTE=str(args.web_rate_per_minute),
+            DART_WEB_MAX_CONCURRENT=str(args.web_max_concurrent),
+            DART_DAILY_LIMIT=str(10 ** 9),
+        )
+        before = fetch_stats(base_url)
+        completed = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", mode, str(size), "--workers", str(args.workers)],
+            env=env, capture_output=True, text=True, cwd=cache_dir,
+        )
+        if completed.returncode != 0:
+            raise Exception(f"{mode} {size}개 실행 실패:\n{completed.stderr[-2000:]}")
+        result = json.loads(completed.stdout.strip().splitlines()[-1])
+        after = fetch_stats(base_url)
+
+    result["requests"] = {
+        endpoint: after[endpoint] - before.get(endpoint, 0)
+        for endpoint in after
+        if endpoint != "/api/corpCode.xml" and after[endpoint] != before.get(endpoint, 0)
+    }
+    return result
+
+
+def print_table(results):
+    header = f"{'경로':<14}{'기업 수':>9}{'초':>9}{'기업/초':>10}{'p50 ms':>10}{'p95 ms':>10}{'RSS MB':>9}{'자식 MB':>9}{'오류':>7}  요청 수"
+    print(header)
+    print("-" * (len(header) + 30))
+    for r in results:
+        requests = ", ".join(f"{endpoint.rsplit('/', 1)[-1]}={count:,}" for endpoint, count in sorted(r["requests"].items()))
+        print(
+            f"{r['mode']:<14}{r['companies']:>9,}{r['seconds']:>9.2f}{r['throughput'] or 0:>10.1f}"
+            f"{r['p50_ms'] or 0:>10.1f}{r['p95_ms'] or 0:>10.1f}{r['peak_rss_mb']:>9.1f}"
+            f"{r['peak_rss_children_mb']:>9.1f}{r['errors']:>7}  {requests}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="DART 파이프라인 오프라인 벤치마크")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "SIZE"), help=argparse.SUPPRESS)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="기업 수 (여러 개)")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=DEFAULT_MODES, help="측정할 경로")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("DART_MAX_WORKERS", "4")), help="동시 요청 수")
+    parser.add_argument("--port", type=int, default=8765, help="모의 서버 포트")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="모의 서버 요청당 평균 지연")
+    parser.add_argument("--jitter-ms", type=float, default=10.0, help="지연 편차 (±)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0, help="status 020 응답 비율 (0~1)")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="합성 감사보고서 PDF 페이지 수")
+    parser.add_argument("--rate-per-minute", type=int, default=1_000_000, help="OpenDART API 분당 호출 제한")
+    parser.add_argument("--web-rate-per-minute", type=int, default=1_000_000, help="DART 웹 분당 요청 제한")
+    parser.add_argument("--web-max-concurrent", type=int, default=64, help="DART 웹 호스트당 동시 요청 수")
+    parser.add_argument("--json", help="결과를 저장할 JSON 파일")
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]), args.workers)
+        return 0
+
+    server, base_url = start_mock_server(args)
+    results = []
+    try:
+        for mode in args.modes:
+            for size in args.sizes:
+                print(f"⏱ {mode} {size:,}개 ...", file=sys.stderr, flush=True)
+                results.append(run_case(mode, size, args, base_url))
+    finally:
+        server.terminate()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,332 @@
+"""
+벤치마크용 로컬 DART 모의 서버 (API 호출 한도를 쓰지 않고 파이프라인 속도를 잰다)
+
+OpenDART API와 DART 웹 중 이 앱이 쓰는 엔드포인트만 흉내 낸다.
+    /api/corpCode.xml, /api/fnlttMultiAcnt.json, /api/list.json
+    /dsaf001/main.do, /pdf/download/pdf.do, /dsap001/search.ax
+    /_stats  (엔드포인트별 요청 수, 벤치마크 집계용)
+
+기업 i는 기업코드 f"{i:08d}", 종목코드 f"{i:06d}", 기업명 f"벤치기업{i:05d}" 이다.
+fnlttMultiAcnt 응답 항목은 실제 API처럼 corp_code 없이 stock_code로 구분되고, fs_div 요청값과 관계없이
+연결(CFS)·일반(OFS) 항목을 함께 담는다. 5의 배수 번째 기업은 연결 재무제표가 없어 일반 항목만 있다.
+
+예)
+    python benchmarks/dart_mock_server.py --companies 10000 --latency-ms 30 --rate-limit-ratio 0.01
+    DART_OPEN_API_URL=http://127.0.0.1:8765/api DART_WEB_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+import argparse
+import datetime
+import io
+import json
+import random
+import threading
+import time
+import zipfile
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import fitz  # PyMuPDF
+
+BENCH_NAME_PREFIX = "벤치기업"
+
+# 응답에 넣는 계정 (앞의 4개가 추출 대상, 나머지는 실제 응답 크기를 맞추기 위한 계정)
+# fnlttMultiAcnt는 account_id(XBRL 표준계정) 없이 계정명만 돌려준다
+ACCOUNTS = [
+    ("BS", "자본총계"),
+    ("BS", "부채총계"),
+    ("IS", "매출액"),
+    ("IS", "영업이익"),
+    ("BS", "유동자산"),
+    ("BS", "비유동자산"),
+    ("BS", "자산총계"),
+    ("BS", "유동부채"),
+    ("BS", "비유동부채"),
+    ("BS", "자본금"),
+    ("BS", "이익잉여금"),
+    ("IS", "법인세차감전 순이익"),
+    ("IS", "당기순이익"),
+]
+SJ_NAMES = {"BS": "재무상태표", "IS": "손익계산서"}
+FS_NAMES = {"CFS": "연결재무제표", "OFS": "재무제표"}
+
+RATE_LIMIT_RESPONSE = {"status": "020", "message": "사용한도를 초과하였습니다."}
+
+
+def corp_code_of(i):
+    return f"{i:08d}"
+
+
+def stock_code_of(i):
+    return f"{i:06d}"
+
+
+def corp_name_of(i):
+    return f"{BENCH_NAME_PREFIX}{i:05d}"
+
+
+def rcp_no_of(corp_code):
+    return f"20240315{corp_code[-6:]}"
+
+
+def amount_of(corp_code, account_index, period):
+    return (int(corp_code) % 997 + 1) * 1_000_000 + account_index * 10_000 + period
+
+
+def build_corp_code_zip(companies):
+    """CORPCODE.xml을 담은 ZIP (실제 파일과 같은 항목 구성)"""
+    rows = "".join(
+        f"<list><corp_code>{corp_code_of(i)}</corp_code><corp_name>{corp_name_of(i)}</corp_name>"
+        f"<stock_code>{stock_code_of(i)}</stock_code><modify_date>20240101</modify_date></list>"
+        for i in range(companies)
+    )
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("CORPCODE.xml", f'<?xml version="1.0" encoding="UTF-8"?><result>{rows}</result>')
+    return buffer.getvalue()
+
+
+def build_audit_pdf(pages):
+    """
+    합성 감사보고서 PDF: 표지/감사의견 페이지 → 재무상태표 → 손익계산서 → 주석 페이지.
+    재무제표 두 페이지를 빼면 모두 본문 텍스트만 있는 페이지다.
+    """
+    pages = max(pages, 4)
+    font = fitz.Font("cjk")
+    doc = fitz.open()
+
+    def add_page(lines):
+        page = doc.new_page()
+        writer = fitz.TextWriter(page.rect)
+        for row, line in enumerate(lines):
+            writer.append((50, 60 + row * 16), line, font=font, fontsize=10)
+        writer.write_text(page)
+
+    filler = ["감사의견 및 감사의견 근거에 관한 설명 문단입니다. " * 2] * 40
+    front = (pages - 2) // 3
+    for _ in range(front):
+        add_page(filler)
+    add_page(["재무상태표", "(단위: 원)", "자산총계 9,876,543,210", "부채총계 1,234,567,890",
+              "자본총계 8,641,975,320"])
+    add_page(["포괄손익계산서", "(단위: 원)", "매출액 5,555,555,555", "매출원가 3,333,333,333",
+              "영업이익 (123,456,789)"])
+    for _ in range(pages - front - 2):
+        add_page(["주석"] + filler)
+    doc.subset_fonts()
+    return doc.tobytes(deflate=True, garbage=3)
+
+
+class MockDart:
+    """모의 응답 데이터와 지연/오류 주입 설정"""
+
+    def __init__(self, companies, latency_ms=0.0, jitter_ms=0.0, rate_limit_ratio=0.0, pdf_pages=20, seed=0):
+        self.companies = companies
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.rate_limit_ratio = rate_limit_ratio
+        self.random = random.Random(seed)
+        self.corp_code_zip = build_corp_code_zip(companies)
+        self.pdf = build_audit_pdf(pdf_pages)
+        self.today = datetime.date.today()
+        self.stats = Counter()
+        self._lock = threading.Lock()
+
+    def index_of(self, corp_code):
+        i = int(corp_code) if corp_code.isdigit() else -1
+        return i if 0 <= i < self.companies else None
+
+    def delay(self):
+        with self._lock:
+            extra = self.random.uniform(-self.jitter, self.jitter)
+        if self.latency + extra > 0:
+            time.sleep(self.latency + extra)
+
+    def rate_limited(self):
+        with self._lock:
+            return self.random.random() < self.rate_limit_ratio
+
+    def count(self, endpoint):
+        with self._lock:
+            self.stats[endpoint] += 1
+
+    def multi_acnt(self, query):
+        """실제 fnlttMultiAcnt 항목 구성 (corp_code/account_id 없음, fs_div 요청값은 무시)"""
+        year = int(query.get("bsns_year") or self.today.year)
+        items = []
+        for corp_code in query.get("corp_code", "").split(","):
+            i = self.index_of(corp_code)
+            if i is None:
+                continue
+            for fs_div in (["OFS"] if i % 5 == 0 else ["CFS", "OFS"]):
+                for account_index, (sj_div, account_nm) in enumerate(ACCOUNTS):
+                    items.append({
+                        "rcept_no": rcp_no_of(corp_code), "bsns_year": str(year),
+                        "stock_code": stock_code_of(i), "reprt_code": query.get("reprt_code"),
+                        "account_nm": account_nm, "fs_div": fs_div, "fs_nm": FS_NAMES[fs_div],
+                        "sj_div": sj_div, "sj_nm": SJ_NAMES[sj_div],
+                        "thstrm_nm": f"제 {year - 1999} 기", "thstrm_dt": f"{year}.12.31 현재",
+                        "thstrm_amount": f"{amount_of(corp_code, account_index, 0):,}",
+                        "frmtrm_nm": f"제 {year - 2000} 기", "frmtrm_dt": f"{year - 1}.12.31 현재",
+                        "frmtrm_amount": f"{amount_of(corp_code, account_index, 1):,}",
+                        "bfefrmtrm_nm": f"제 {year - 2001} 기", "bfefrmtrm_dt": f"{year - 2}.12.31 현재",
+                        "bfefrmtrm_amount": f"{amount_of(corp_code, account_index, 2):,}",
+                        "ord": str(account_index + 1), "currency": "KRW",
+                    })
+        if not items:
+            return {"status": "013", "message": "조회된 데이타가 없습니다."}
+        return {"status": "000", "message": "정상", "list": items}
+
+    def company_filings(self, i):
+        """기업 i의 공시 [(접수일, 공시유형, 보고서명, 접수번호)]. 감사보고서 접수일은 기업마다 조금씩 다르다."""
+        corp_code = corp_code_of(i)
+        return [
+            (self.days_ago(60), "A", "분기보고서", f"20240515{corp_code[-6:]}"),
+            (self.days_ago(200 + i % 60), "F", "감사보고서 (2023.12)", rcp_no_of(corp_code)),
+            (self.days_ago(400), "A", "반기보고서", f"20230814{corp_code[-6:]}"),
+        ]
+
+    def days_ago(self, days):
+        return (self.today - datetime.timedelta(days=days)).strftime("%Y%m%d")
+
+    def filings(self, query):
+        """list.json: corp_code(없으면 전체), bgn_de/end_de, pblntf_ty, page_no/page_count 지원, 최신순"""
+        corp_code = query.get("corp_code")
+        if corp_code:
+            i = self.index_of(corp_code)
+            companies = [] if i is None else [i]
+        else:
+            companies = range(self.companies)
+        bgn_de = query.get("bgn_de", "00000000")
+        end_de = query.get("end_de", "99999999")
+        pblntf_ty = query.get("pblntf_ty")
+        matched = sorted(
+            (
+                (rcept_dt, rcept_no, i, report_nm)
+                for i in companies
+                for rcept_dt, ty, report_nm, rcept_no in self.company_filings(i)
+                if bgn_de <= rcept_dt <= end_de and (not pblntf_ty or ty == pblntf_ty)
+            ),
+            reverse=True,
+        )
+        if not matched:
+            return {"status": "013", "message": "조회된 데이타가 없습니다."}
+
+        page_no = int(query.get("page_no", 1))
+        page_count = int(query.get("page_count", 10))
+        page = matched[(page_no - 1) * page_count:page_no * page_count]
+        return {
+            "status": "000", "message": "정상", "page_no": page_no, "page_count": page_count,
+            "total_count": len(matched), "total_page": (len(matched) + page_count - 1) // page_count,
+            "list": [
+                {"corp_code": corp_code_of(i), "corp_name": corp_name_of(i), "stock_code": stock_code_of(i), "corp_cls": "Y",
+                 "report_nm": report_nm, "rcept_no": rcept_no, "flr_nm": corp_name_of(i),
+                 "rcept_dt": rcept_dt, "rm": ""}
+                for rcept_dt, rcept_no, i, report_nm in page
+            ],
+        }
+
+    def search_html(self, query):
+        name = query.get("textCrpNm", "")
+        i = self.index_of(name[len(BENCH_NAME_PREFIX):]) if name.startswith(BENCH_NAME_PREFIX) else None
+        rows = ""
+        if i is not None:
+            corp_code = corp_code_of(i)
+            rows = (
+                f'<tr><td>{corp_name_of(i)}</td><td><a href="/dsaf001/main.do?rcpNo=20240515{corp_code[-6:]}">'
+                f"분기보고서 (2024.03)</a></td><td>20240515</td></tr>"
+                f'<tr><td>{corp_name_of(i)}</td><td><a href="/dsaf001/main.do?rcpNo={rcp_no_of(corp_code)}">'
+                f"감사보고서 (2023.12)</a></td><td>20240315</td></tr>"
+            )
+        return f"<html><body><table><tbody>{rows}</tbody></table></body></html>"
+
+    def viewer_html(self, query):
+        rcp_no = query.get("rcpNo", "")
+        return (
+            f"<html><head><title>DART</title></head><body><div id='center'>"
+            f'<iframe id="pdf" src="/pdf/download/pdf.do?rcp_no={rcp_no}&dcm_no=1"></iframe>'
+            f"</div></body></html>"
+        )
+
+
+def make_handler(mock):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive (실제 세션의 연결 재사용과 맞춘다)
+
+        def log_message(self, *args):
+            pass
+
+        def send(self, body, content_type, status=200):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def send_json(self, data):
+            self.send(json.dumps(data, ensure_ascii=False).encode("utf-8"), "application/json; charset=utf-8")
+
+        def send_html(self, html):
+            self.send(html.encode("utf-8"), "text/html; charset=utf-8")
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            query = {key: values[0] for key, values in parse_qs(url.query).items()}
+            if url.path == "/_stats":
+                return self.send_json(dict(mock.stats))
+
+            mock.count(url.path)
+            mock.delay()
+            if url.path.startswith("/api/") and url.path.endswith(".json") and mock.rate_limited():
+                mock.count("status 020")
+                return self.send_json(RATE_LIMIT_RESPONSE)
+
+            if url.path == "/api/corpCode.xml":
+                self.send(mock.corp_code_zip, "application/x-msdownload")
+            elif url.path == "/api/fnlttMultiAcnt.json":
+                self.send_json(mock.multi_acnt(query))
+            elif url.path == "/api/list.json":
+                self.send_json(mock.filings(query))
+            elif url.path == "/dsap001/search.ax":
+                self.send_html(mock.search_html(query))
+            elif url.path == "/dsaf001/main.do":
+                self.send_html(mock.viewer_html(query))
+            elif url.path == "/pdf/download/pdf.do":
+                self.send(mock.pdf, "application/pdf")
+            else:
+                self.send(b"", "text/plain", 404)
+
+    return Handler
+
+
+def serve(mock, host="127.0.0.1", port=0):
+    """백그라운드 스레드에서 서버 시작. 반환: (서버, 기본 URL)"""
+    server = ThreadingHTTPServer((host, port), make_handler(mock))
+    server.daemon_threads = True
+    server.request_queue_size = 256
+    threading.Thread(target=server.serve_forever, name="mock-dart", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="로컬 DART 모의 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--companies", type=int, default=10_000, help="corpCode.xml에 넣을 기업 수")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="요청마다 추가하는 평균 지연")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="지연 편차 (±)")
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0,
+                        help="API(JSON) 요청 중 status 020(요청 제한 초과)으로 응답할 비율")
+    parser.add_argument("--pdf-pages", type=int, default=20, help="합성 감사보고서 PDF 페이지 수")
+    args = parser.parse_args(argv)
+
+    mock = MockDart(args.companies, args.latency_ms, args.jitter_ms, args.rate_limit_ratio, args.pdf_pages)
+    server, base_url = serve(mock, args.host, args.port)
+    print(f"모의 DART 서버: {base_url} (기업 {args.companies:,}개)", flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
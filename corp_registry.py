@@ -0,0 +1,260 @@
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import namedtuple
+
+import pandas as pd
+
+from dart_http import http_get
+from dart_settings import CORP_REFRESH_INTERVAL, OPEN_DART_API, cache_path
+from quota_tracker import get_quota_tracker
+
+log = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "corp_list.csv"
+
+# 백그라운드 갱신이 실패한 뒤 다시 시도하기까지 기다리는 시간(초)
+REFRESH_RETRY_DELAY = 600
+
+# corpCode.xml에서 보관하는 항목
+CORP_COLUMNS = ["corp_code", "corp_name", "stock_code", "modify_date"]
+
+# 정규화 시 제거하는 문자 (공백, ㈜, (주), 주식회사)
+NORMALIZE_PATTERN = r"[\s㈜(주)주식회사]"
+
+
+# 이름 정규화 (external_audit_parser와 동일한 규칙)
+def normalize_name(name):
+    return re.sub(NORMALIZE_PATTERN, "", name.lower())
+
+
+# corpCode.xml을 한 건씩 읽어 항목별 리스트(열 단위)로 모은다
+def parse_corp_code_xml(xml_file):
+    """
+    전체 XML 문자열이나 트리를 만들지 않고 <list> 요소를 하나씩 읽는다.
+    읽은 요소는 루트에서 바로 떼어 내므로 파싱 중에도 메모리에는 항목별 열만 남는다.
+    """
+    columns = {column: [] for column in CORP_COLUMNS}
+    root = None
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        if root is None:
+            root = elem  # 첫 start 이벤트가 루트(<result>)
+        if event != "end" or elem.tag != "list":
+            continue
+        # 비상장사의 stock_code는 공백(" ")이라 strip하면 ""가 된다
+        for column in CORP_COLUMNS:
+            columns[column].append((elem.findtext(column) or "").strip())
+        root.clear()
+    # object 대신 문자열 dtype (pandas 3에서는 pyarrow 문자열)으로 보관해 메모리를 줄인다
+    return pd.DataFrame(columns, dtype="str")
+
+
+# DART 전체 기업 목록 다운로드 (corpCode.xml ZIP)
+def load_corp_list(api_key):
+    response = http_get(f"{OPEN_DART_API}/corpCode.xml?crtfc_key={api_key}")
+    get_quota_tracker().record(response)
+    with zipfile.ZipFile(io.BytesIO(response.content)) as z:
+        with z.open("CORPCODE.xml") as xml_file:
+            return parse_corp_code_xml(xml_file)
+
+
+def stock_codes_of(corp_list_df, corp_codes):
+    """상장사의 {기업코드: 종목코드} (fnlttMultiAcnt 응답 항목은 종목코드로 구분된다)"""
+    if "stock_code" not in corp_list_df:
+        return {}
+    stock_codes = corp_list_df["stock_code"].fillna("").str.strip()
+    rows = corp_list_df["corp_code"].isin(list(corp_codes)) & (stock_codes != "")
+    return dict(zip(corp_list_df.loc[rows, "corp_code"], stock_codes[rows]))
+
+
+# 레지스트리가 한 번에 교체하는 상태 (목록 + 인덱스)
+_RegistryState = namedtuple("_RegistryState", ["corp_list_df", "by_name", "by_norm_name", "duplicate_names"])
+
+
+def _build_state(corp_list_df):
+    names = corp_list_df["corp_name"].fillna("")
+    codes = corp_list_df["corp_code"]
+    norm_names = names.str.lower().str.replace(NORMALIZE_PATTERN, "", regex=True)
+
+    # 뒤에서부터 채워서 앞쪽(먼저 나온) 기업코드가 남도록 한다
+    return _RegistryState(
+        corp_list_df,
+        dict(zip(names[::-1], codes[::-1])),
+        dict(zip(norm_names[::-1], codes[::-1])),
+        int(norm_names.duplicated().sum()),
+    )
+
+
+def merge_corp_list(current_df, fresh_df):
+    """
+    새로 받은 목록에서 modify_date가 현재 목록보다 최신인 기업과 새 기업만 반영한다.
+    기존 기업의 순서는 유지하고, 새 기업은 뒤에 붙인다. 반환: (병합 목록, 반영 건수)
+    """
+    cutoff = current_df["modify_date"].max() if len(current_df) else ""
+    is_new = ~fresh_df["corp_code"].isin(current_df["corp_code"])
+    changed = fresh_df[(fresh_df["modify_date"] > cutoff) | is_new].set_index("corp_code")
+    if changed.empty:
+        return current_df, 0
+
+    merged = current_df.set_index("corp_code")
+    existing = changed.index.isin(merged.index)
+    merged.loc[changed.index[existing], changed.columns] = changed[existing]
+    merged = pd.concat([merged, changed[~existing]]).reset_index()
+    return merged[CORP_COLUMNS], len(changed)
+
+
+class CorpRegistry:
+    """
+    한 번 불러온 DART 기업 목록을 보관하고 기업명 → 기업코드 조회를 제공한다.
+    원본 이름과 정규화된 이름 두 가지 dict 인덱스를 만들어 두므로 조회는 O(1)이다.
+    같은 이름이 여러 번 나오면 목록에서 먼저 나온 기업코드를 사용한다.
+    refresh()는 새 목록과 인덱스를 모두 만든 뒤 한 번에 교체하므로 조회 중에도 안전하다.
+    """
+
+    def __init__(self, corp_list_df, version=0, saved_at=None):
+        self._state = _build_state(corp_list_df)
+        self.version = version
+        self.saved_at = saved_at or time.time()
+        self._refresh_lock = threading.Lock()
+        self._retry_at = 0.0
+
+    @property
+    def corp_list_df(self):
+        return self._state.corp_list_df
+
+    @property
+    def duplicate_names(self):
+        return self._state.duplicate_names
+
+    @classmethod
+    def from_api(cls, api_key):
+        return cls(load_corp_list(api_key))
+
+    @classmethod
+    def from_snapshot(cls, path):
+        # corp_code 앞자리 0이 사라지지 않도록 문자열로 읽는다
+        corp_list_df = pd.read_csv(path, dtype=str, keep_default_na=False)
+        # 예전 스냅샷에는 stock_code, modify_date가 없다
+        for column in CORP_COLUMNS:
+            if column not in corp_list_df:
+                corp_list_df[column] = ""
+
+        meta = {}
+        if os.path.exists(f"{path}.meta.json"):
+            with open(f"{path}.meta.json", encoding="utf-8") as f:
+                meta = json.load(f)
+        return cls(
+            corp_list_df[CORP_COLUMNS],
+            version=meta.get("version", 0),
+            saved_at=meta.get("saved_at", os.path.getmtime(path)),
+        )
+
+    def save_snapshot(self, path):
+        """목록과 메타정보(버전, 저장 시각)를 임시 파일에 쓴 뒤 교체한다."""
+        state = self._state
+        tmp_path = f"{path}.tmp"
+        state.corp_list_df.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+        meta = {
+            "version": self.version,
+            "saved_at": self.saved_at,
+            "count": len(state.corp_list_df),
+            "max_modify_date": state.corp_list_df["modify_date"].max() if len(state.corp_list_df) else "",
+        }
+        with open(f"{path}.meta.json.tmp", "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(f"{path}.meta.json.tmp", f"{path}.meta.json")
+
+    def is_stale(self, max_age=CORP_REFRESH_INTERVAL):
+        return time.time() - self.saved_at > max_age
+
+    def refresh(self, api_key, snapshot_path=None):
+        """
+        DART에서 목록을 다시 받아 변경분만 병합하고 인덱스를 교체한다. 반환: 반영 건수
+        """
+        with self._refresh_lock:
+            merged, changed = merge_corp_list(self.corp_list_df, load_corp_list(api_key))
+            if changed:
+                self._state = _build_state(merged)
+                self.version += 1
+            self.saved_at = time.time()
+            if snapshot_path:
+                self.save_snapshot(snapshot_path)
+            return changed
+
+    def refresh_in_background(self, api_key, snapshot_path=None):
+        """
+        백그라운드 스레드에서 refresh()를 실행한다. DART가 느리거나 실패해도 기존 목록으로 계속 조회된다.
+        이미 갱신 중이거나 실패한 지 REFRESH_RETRY_DELAY초가 안 됐으면 아무것도 하지 않는다 (매 실행마다 호출해도 된다).
+        """
+        def run():
+            try:
+                self.refresh(api_key, snapshot_path)
+            except Exception as e:
+                self._retry_at = time.time() + REFRESH_RETRY_DELAY
+                log.warning("⚠️ 기업 목록 갱신 실패 (기존 목록 사용): %s", e)
+
+        if self._refresh_lock.locked() or time.time() < self._retry_at:
+            return None
+        thread = threading.Thread(target=run, name="corp-registry-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def __len__(self):
+        return len(self.corp_list_df)
+
+    def get_corp_code(self, corp_name):
+        """원본 기업명이 정확히 일치하는 기업코드"""
+        return self._state.by_name.get(corp_name)
+
+    def get_corp_code_normalized(self, corp_name):
+        """(주), 공백 등을 제거한 정규화 이름 기준 기업코드"""
+        return self._state.by_norm_name.get(normalize_name(corp_name))
+
+    def stock_codes(self, corp_codes):
+        return stock_codes_of(self.corp_list_df, corp_codes)
+
+    def resolve(self, corp_names, normalized=False):
+        """여러 기업명을 한 번에 조회해 {기업명: 기업코드 또는 None} 반환"""
+        lookup = self.get_corp_code_normalized if normalized else self.get_corp_code
+        return {name: lookup(name) for name in corp_names}
+
+
+# ✅ 프로세스 전체에서 하나만 유지되는 레지스트리
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_corp_registry(api_key=None, snapshot_path=None):
+    """
+    공유 레지스트리를 반환한다. 처음 호출될 때만 로컬 스냅샷 또는 DART API에서 불러온다.
+    스냅샷이 오래됐으면 바로 스냅샷으로 시작하고, 변경분 갱신은 백그라운드에서 진행한다.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            snapshot_path = snapshot_path or cache_path(SNAPSHOT_FILE)
+            if os.path.exists(snapshot_path):
+                _registry = CorpRegistry.from_snapshot(snapshot_path)
+                if api_key and _registry.is_stale():
+                    _registry.refresh_in_background(api_key, snapshot_path)
+            elif api_key:
+                _registry = CorpRegistry.from_api(api_key)
+                _registry.save_snapshot(snapshot_path)
+            else:
+                raise Exception("기업 목록을 불러올 API 키 또는 스냅샷이 없습니다.")
+        return _registry
+
+
+def set_corp_registry(registry):
+    """외부에서 만든 레지스트리를 공유 레지스트리로 지정한다 (테스트/배치용)."""
+    global _registry
+    with _registry_lock:
+        _registry = registry
@@ -0,0 +1,67 @@
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from dart_settings import (
+    HTTP_CONNECT_TIMEOUT,
+    HTTP_READ_TIMEOUT,
+    HTTP_MAX_RETRIES,
+    HTTP_POOL_SIZE,
+)
+from stage_metrics import record_http
+
+DEFAULT_TIMEOUT = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def _build_retry():
+    options = dict(
+        total=HTTP_MAX_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD"]),
+        raise_on_status=False,
+    )
+    try:
+        return Retry(backoff_jitter=0.5, **options)
+    except TypeError:  # urllib3 < 2.0에는 backoff_jitter가 없음
+        return Retry(**options)
+
+
+def get_session():
+    """
+    opendart.fss.or.kr / dart.fss.or.kr 호출에 공통으로 쓰는 세션.
+    호스트별 연결 풀(keep-alive), gzip 응답, 5xx 재시도가 설정되어 있다.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=HTTP_POOL_SIZE,
+                max_retries=_build_retry(),
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers.update({
+                "Accept-Encoding": "gzip, deflate",
+                "User-Agent": "Mozilla/5.0 (dart-financial-fetcher)",
+            })
+            _session = session
+        return _session
+
+
+def http_get(url, **kwargs):
+    """
+    requests.get 대신 사용. timeout을 지정하지 않으면 기본값을 적용한다.
+    진행 중인 처리 단계(stage_metrics)가 있으면 요청 수, 받은 bytes, 재시도 횟수를 기록한다.
+    """
+    kwargs.setdefault("timeout", DEFAULT_TIMEOUT)
+    response = get_session().get(url, **kwargs)
+    record_http(response)
+    return response
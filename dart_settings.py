@@ -0,0 +1,55 @@
+import os
+
+# ✅ DART 엔드포인트 (벤치마크용 로컬 모의 서버를 쓸 때는 환경변수로 변경)
+OPEN_DART_API = os.environ.get("DART_OPEN_API_URL", "https://opendart.fss.or.kr/api")
+DART_WEB = os.environ.get("DART_WEB_URL", "https://dart.fss.or.kr")
+
+# ✅ 보고서 유형 → reprt_code
+REPORT_TYPES = {
+    "사업보고서": "11011",
+    "반기보고서": "11012",
+    "1분기보고서": "11013",
+    "3분기보고서": "11014"
+}
+
+# ✅ 로컬 캐시/스냅샷 저장 위치 (환경변수로 변경 가능)
+CACHE_DIR = os.environ.get("DART_CACHE_DIR", ".dart_cache")
+
+
+def cache_path(*parts):
+    """CACHE_DIR 아래 경로를 만들고, 상위 폴더가 없으면 생성한다."""
+    path = os.path.join(CACHE_DIR, *parts)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return path
+
+# ✅ 동시 요청 / 호출 한도 (OpenDART: 개인 키 기준 일 20,000건, 분당 과다 호출 시 차단)
+DART_MAX_WORKERS = int(os.environ.get("DART_MAX_WORKERS", "4"))
+DART_RATE_PER_MINUTE = int(os.environ.get("DART_RATE_PER_MINUTE", "600"))
+DART_DAILY_LIMIT = int(os.environ.get("DART_DAILY_LIMIT", "20000"))
+DART_WEB_RATE_PER_MINUTE = int(os.environ.get("DART_WEB_RATE_PER_MINUTE", "120"))
+# dart.fss.or.kr 등 웹 호스트 하나에 동시에 보내는 요청 수 (스레드 수와 무관하게 이 이상 보내지 않음)
+DART_WEB_MAX_CONCURRENT = int(os.environ.get("DART_WEB_MAX_CONCURRENT", "2"))
+
+# ✅ HTTP 연결 (초 단위: 연결 / 응답 대기)
+HTTP_CONNECT_TIMEOUT = float(os.environ.get("DART_HTTP_CONNECT_TIMEOUT", "5"))
+HTTP_READ_TIMEOUT = float(os.environ.get("DART_HTTP_READ_TIMEOUT", "60"))
+HTTP_MAX_RETRIES = int(os.environ.get("DART_HTTP_MAX_RETRIES", "3"))
+HTTP_POOL_SIZE = int(os.environ.get("DART_HTTP_POOL_SIZE", "32"))
+
+# ✅ 재무제표 결과 캐시 (SQLite). DART_RESULT_CACHE=0 으로 끌 수 있음
+RESULT_CACHE_ENABLED = os.environ.get("DART_RESULT_CACHE", "1") != "0"
+
+# ✅ 감사보고서 PDF/텍스트 캐시 (rcp_no 기준, 용량 초과 시 오래 안 쓴 것부터 삭제)
+FILING_CACHE_ENABLED = os.environ.get("DART_FILING_CACHE", "1") != "0"
+FILING_CACHE_MAX_MB = int(os.environ.get("DART_FILING_CACHE_MAX_MB", "500"))
+
+# ✅ 외부감사관련 공시 색인 (SQLite). 감사보고서는 최근 이 기간(일) 안에서 찾는다
+FILING_INDEX_ENABLED = os.environ.get("DART_FILING_INDEX", "1") != "0"
+FILING_LOOKBACK_DAYS = int(os.environ.get("DART_FILING_LOOKBACK_DAYS", "730"))
+
+# ✅ DART 웹 페이지 HTML 캐시. 검색 결과는 이 시간(초)이 지나면 조건부 요청으로 다시 확인
+WEB_CACHE_ENABLED = os.environ.get("DART_WEB_CACHE", "1") != "0"
+WEB_SEARCH_CACHE_TTL = int(os.environ.get("DART_WEB_SEARCH_CACHE_HOURS", "24")) * 3600
+
+# ✅ 기업 목록 스냅샷 갱신 주기 (초). 지나면 백그라운드에서 변경분만 반영
+CORP_REFRESH_INTERVAL = int(os.environ.get("DART_CORP_REFRESH_HOURS", "24")) * 3600
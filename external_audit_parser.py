@@ -1,77 +1,156 @@
+import logging
+import threading
+import weakref
+
 import fitz  # PyMuPDF
-import re
-import requests
-import os
 from bs4 import BeautifulSoup
-import requests
 
+from account_extractor import TARGET_ACCOUNTS, compact, get_extractor, spaced_pattern
+from corp_registry import CorpRegistry
+from dart_settings import DART_WEB
+from fetch_engine import IN_FLIGHT, polite_get
+from filing_cache import get_filing_cache
+from filing_index import find_latest_audit_rcp_no
+from stage_metrics import get_stage_metrics, stage
 
-# PDF에서 텍스트 추출
-def extract_text_from_pdf_url(pdf_url):
-    response = requests.get(pdf_url)
+log = logging.getLogger(__name__)
+
+# 추출 대상 계정(TARGET_ACCOUNTS)이 나오는 재무제표 페이지 제목
+STATEMENT_TITLES = ["재무상태표", "손익계산서", "포괄손익계산서"]
+
+# PDF 다운로드 (파일로 저장하지 않고 bytes로 반환, dart.fss.or.kr 요청 제한을 지킨다)
+def download_pdf(pdf_url):
+    response = polite_get(pdf_url)
     if response.status_code != 200:
         raise Exception("PDF 다운로드 실패")
 
     # PDF 응답이 맞는지 체크 (응답 헤더 또는 내용 앞부분)
-    if not response.headers["Content-Type"].startswith("application/pdf"):
-        print("❌ PDF 아님! 응답 헤더:", response.headers)
-        print("📦 응답 내용:", response.text[:200])
+    if not response.headers.get("Content-Type", "").startswith("application/pdf"):
+        log.debug("❌ PDF 아님! Content-Type: %s / 응답 앞부분: %r",
+                  response.headers.get("Content-Type"), response.content[:200])
         raise Exception("PDF가 아닌 응답이 반환됨")
 
-    temp_filename = "temp.pdf"
-    with open(temp_filename, "wb") as f:
-        f.write(response.content)
+    return response.content
 
-    text = ""
-    with fitz.open(temp_filename) as doc:
+# 재무제표 페이지만 골라서 [(페이지 번호, 텍스트), ...] 로 추출
+def extract_statement_pages(pdf_bytes, accounts=TARGET_ACCOUNTS):
+    """
+    메모리에 있는 PDF를 열어 재무상태표/손익계산서가 있는 페이지의 텍스트만 모은다.
+    제목과 계정명은 글자 사이 공백("재 무 상 태 표")이 있어도 찾는다.
+    대상 계정이 모두 나오면 나머지 페이지는 읽지 않는다.
+    재무제표 페이지에서 못 찾은 계정이 있으면 나머지 페이지도 끝까지 읽어 재무제표 페이지 뒤에 붙인다.
+    """
+    title_pattern = spaced_pattern(tuple(STATEMENT_TITLES))
+    account_pattern = spaced_pattern(tuple(accounts))
+    statement_pages = []
+    other_pages = []
+    remaining = {compact(account) for account in accounts}
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
         for page in doc:
-            text += page.get_text()
+            page_text = page.get_text()
+            if not title_pattern.search(page_text):
+                other_pages.append((page.number + 1, page_text))
+                continue
+            statement_pages.append((page.number + 1, page_text))
+            remaining -= {compact(name) for name in account_pattern.findall(page_text)}
+            if not remaining:
+                return statement_pages
 
-    os.remove(temp_filename)
-    return text
+    return statement_pages + other_pages
 
-    temp_filename = "temp.pdf"
-    with open(temp_filename, "wb") as f:
-        f.write(response.content)
+# 재무제표 페이지 텍스트를 하나로 합쳐 반환
+def extract_statement_text(pdf_bytes, accounts=TARGET_ACCOUNTS):
+    return "\n".join(text for _, text in extract_statement_pages(pdf_bytes, accounts))
 
-    text = ""
-    with fitz.open(temp_filename) as doc:
-        for page in doc:
-            text += page.get_text()
-
-    os.remove(temp_filename)
-    return text
-
-# 텍스트에서 숫자 추출 (정규표현식 사용)
-def extract_financials_from_text(text):
-    # 숫자 추출 정규표현식 (단위: 억 원, 조 원 등 포함 가능)
-    def find_value(keyword):
-        pattern = rf"{keyword}[\s:：\-]*([\d,]+)"
-        match = re.search(pattern, text.replace(",", ""), re.IGNORECASE)
-        return match.group(1) if match else "없음"
-
-    return {
-        "자본총계": find_value("자본총계"),
-        "부채총계": find_value("부채총계"),
-        "매출액": find_value("매출액"),
-        "영업이익": find_value("영업이익")
-    }
+# PDF에서 텍스트 추출
+def extract_text_from_pdf_url(pdf_url):
+    return extract_statement_text(download_pdf(pdf_url))
+
+# 텍스트에서 숫자 추출 (계정 전체를 묶은 정규식으로 한 번만 훑는다)
+def extract_financials_from_text(text, accounts=TARGET_ACCOUNTS):
+    """
+    text는 문자열 또는 [(페이지 번호, 텍스트), ...].
+    단위 표기(원/천원/백만원)를 반영한 원 단위 값을 문자열로 반환하고, 괄호 금액은 음수로 읽는다.
+    """
+    found = get_extractor(tuple(accounts)).extract(text)
+    return {account: str(found[account].value) if account in found else "없음" for account in accounts}
+
+# PDF bytes → 재무 수치 (프로세스 풀에서 실행할 수 있도록 모듈 최상위 함수로 둔다)
+def parse_audit_pdf_bytes(pdf_bytes, accounts=TARGET_ACCOUNTS):
+    try:
+        pages = extract_statement_pages(pdf_bytes, accounts)
+        return extract_financials_from_text(pages, accounts)
+    except Exception as e:
+        return {"오류": str(e)}
+
+# PDF bytes → (재무제표 페이지, 재무 수치). 페이지는 캐시에 저장할 수 있도록 함께 반환
+def extract_pages_and_financials(pdf_bytes, accounts=TARGET_ACCOUNTS):
+    pages = extract_statement_pages(pdf_bytes, accounts)
+    return pages, extract_financials_from_text(pages, accounts)
+
+# rcp_no 기준 PDF 원본 (캐시에 없으면 다운로드 후 저장)
+def load_audit_pdf(rcp_no, cache=None):
+    cache = cache or get_filing_cache()
+    pdf_bytes = cache.get_pdf(rcp_no) if cache else None
+    if pdf_bytes is not None:
+        get_stage_metrics().record("download", cache_hits=1)
+    else:
+        # 같은 공시를 여러 곳에서 동시에 요청하면 한 번만 받아 나눠 쓴다
+        pdf_bytes = IN_FLIGHT.do(("pdf", rcp_no), _download_audit_pdf, rcp_no, cache)
+    return pdf_bytes
+
+def _download_audit_pdf(rcp_no, cache):
+    pdf_url = get_pdf_download_url(rcp_no)
+    with stage("download"):
+        pdf_bytes = download_pdf(pdf_url)
+    if cache:
+        cache.put_pdf(rcp_no, pdf_bytes)
+    return pdf_bytes
+
+# 통합 함수 (rcp_no만 입력받아 결과 반환, 이미 본 공시는 캐시에서 바로 처리)
+def parse_audit_filing(rcp_no, accounts=TARGET_ACCOUNTS, cache=None):
+    cache = cache or get_filing_cache()
+    try:
+        pages = cache.get_pages(rcp_no, accounts) if cache else None
+        if pages is not None:
+            with stage("parse") as event:
+                event["cache_hits"] += 1
+                return extract_financials_from_text(pages, accounts)
+
+        pdf_bytes = load_audit_pdf(rcp_no, cache)
+        with stage("parse"):
+            pages, financials = extract_pages_and_financials(pdf_bytes, accounts)
+        if cache:
+            cache.put_pages(rcp_no, accounts, pages)
+        return financials
+    except Exception as e:
+        return {"오류": str(e)}
 
 # 통합 함수 (PDF URL만 입력받아 결과 반환)
 def parse_external_audit_pdf(pdf_url):
     try:
-        text = extract_text_from_pdf_url(pdf_url)
-        return extract_financials_from_text(text)
+        pdf_bytes = download_pdf(pdf_url)
     except Exception as e:
         return {"오류": str(e)}
+    return parse_audit_pdf_bytes(pdf_bytes)
 
 # rcp_no → 진짜 PDF 다운로드 URL 자동 추출 함수
 def get_pdf_download_url(rcp_no):
     """
     rcp_no를 이용해 DART 보고서 페이지를 열고, PDF 다운로드 링크를 추출한다.
+    한 번 찾은 링크는 공시 캐시에 저장해 다시 열지 않는다.
     """
-    base_url = f"https://dart.fss.or.kr/dsaf001/main.do?rcpNo={rcp_no}"
-    response = requests.get(base_url)
+    cache = get_filing_cache()
+    with stage("viewer") as event:
+        cached_url = cache.get_pdf_url(rcp_no) if cache else None
+        if cached_url:
+            event["cache_hits"] += 1
+            return cached_url
+        return IN_FLIGHT.do(("dsaf001", rcp_no), _scrape_pdf_download_url, rcp_no, cache)
+
+def _scrape_pdf_download_url(rcp_no, cache):
+    base_url = f"{DART_WEB}/dsaf001/main.do?rcpNo={rcp_no}"
+    response = polite_get(base_url)
     
     if response.status_code != 200:
         raise Exception("DART 보고서 본문 페이지 접근 실패")
@@ -82,43 +161,49 @@ def get_pdf_download_url(rcp_no):
     iframe = soup.find("iframe", {"id": "pdf"})
     if iframe and "src" in iframe.attrs:
         # 상대 경로일 경우 절대 경로로 바꿔주기
-        pdf_url = "https://dart.fss.or.kr" + iframe["src"]
+        pdf_url = DART_WEB + iframe["src"]
+        if cache:
+            cache.put_pdf_url(rcp_no, pdf_url)
         return pdf_url
     else:
         raise Exception("PDF 링크를 찾을 수 없습니다.")
 
-# 📄 "가장 최신 외부감사보고서의 rcp_no를 자동으로 가져오는 함수" 만들어줄게.
+# 📄 가장 최신 외부감사보고서의 rcp_no
 def get_latest_audit_rcp_no(corp_code, api_key):
-    url = (
-        f"https://opendart.fss.or.kr/api/list.json?"
-        f"crtfc_key={api_key}&corp_code={corp_code}&page_count=100"
-    )
-    response = requests.get(url).json()
-
-    if response.get("status") != "000":
-        raise Exception(f"공시 목록 조회 실패: {response.get('message')}")
+    """
+    최근 FILING_LOOKBACK_DAYS일 안에서 가장 최근 감사보고서를 찾는다 (filing_index 참고).
+    미리 받아 둔 색인 기간은 API 호출 없이 로컬에서 찾고, 나머지 기간만 list.json을 기간·공시유형(F)으로 조회한다.
+    """
+    # 같은 기업을 동시에 찾는 요청은 공시 목록을 한 번만 조회한다
+    with stage("list"):
+        rcp_no = IN_FLIGHT.do(("list.json", corp_code), find_latest_audit_rcp_no, corp_code, api_key)
+    if not rcp_no:
+        raise Exception("감사보고서를 찾을 수 없습니다.")
+    return rcp_no
 
-    reports = response.get("list", [])
+# 이름 정규화도 포함 연도 조건 없이 감사보고서 자동 탐지
+# ✅ DataFrame으로 조회할 때 만든 레지스트리 (같은 DataFrame이면 인덱스를 다시 만들지 않는다)
+_df_registry = (None, None)
+_df_registry_lock = threading.Lock()
 
-    for report in reports:
-        report_nm = report.get("report_nm", "")
-        if re.search(r"감사", report_nm):  # ← 이걸로 '외부감사보고서' 등 다 걸림
-            return report["rcp_no"]
 
-    raise Exception("감사보고서를 찾을 수 없습니다.")
+def registry_for(corp_list_df):
+    global _df_registry
+    with _df_registry_lock:
+        df_ref, registry = _df_registry
+        if df_ref is None or df_ref() is not corp_list_df:
+            registry = CorpRegistry(corp_list_df)
+            _df_registry = (weakref.ref(corp_list_df), registry)
+        return registry
 
-# 이름 정규화도 포함 연도 조건 없이 감사보고서 자동 탐지
-def normalize_name(name):
-    return re.sub(r"[\s㈜(주)주식회사]", "", name.lower())
 
 def get_corp_code(corp_name, corp_list_df):
     """
     (주), 공백 등을 제거한 정규화된 이름 기준으로 기업코드 조회
+    corp_list_df 자리에 공유 CorpRegistry를 넘기면 미리 만든 인덱스로 바로 찾는다.
+    DataFrame을 넘기면 인덱스는 그 DataFrame마다 한 번만 만든다.
     """
-    norm_name = normalize_name(corp_name)
-    corp_list_df["norm_name"] = corp_list_df["corp_name"].apply(normalize_name)
-    match = corp_list_df[corp_list_df["norm_name"] == norm_name]
-    if not match.empty:
-        return match.iloc[0]["corp_code"]
-    return None
+    if not isinstance(corp_list_df, CorpRegistry):
+        corp_list_df = registry_for(corp_list_df)
+    return corp_list_df.get_corp_code_normalized(corp_name)
 
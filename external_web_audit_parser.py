@@ -1,72 +1,102 @@
-import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+import html
+import logging
 import re
 
+from dart_settings import DART_WEB, WEB_SEARCH_CACHE_TTL
+from account_extractor import TARGET_ACCOUNTS, get_extractor
+from external_audit_parser import download_pdf, extract_statement_pages
+from fetch_engine import IN_FLIGHT, get_web_html
+from stage_metrics import company, stage
+
+log = logging.getLogger(__name__)
+
+# 계정명과 숫자 사이에 허용하는 문자 (웹 기반 보고서는 느슨하게)
+WEB_VALUE_GAP = r".{0,20}?"
+
+# 검색 결과 표의 행/칸과 보고서 링크 (문서 전체를 트리로 만들지 않고 행만 읽는다)
+ROW_PATTERN = re.compile(r"<tr\b[^>]*>(.*?)</tr>", re.S | re.I)
+CELL_PATTERN = re.compile(r"<td\b[^>]*>(.*?)</td>", re.S | re.I)
+RCP_LINK_PATTERN = re.compile(r"""<a\b[^>]*href=["'][^"']*rcpNo=(\d+)""", re.I)
+TAG_PATTERN = re.compile(r"<[^>]+>")
+
 def clean_corp_name(name):
     """
     기업명에서 (주), 주식회사, ㈜, 유한회사 등 정리
     """
     return re.sub(r"\(주\)|주식회사|㈜|주\s*|유한회사|유\s*|\(유\)", "", name).strip()
 
+def cell_text(cell):
+    return " ".join(html.unescape(TAG_PATTERN.sub(" ", cell)).split())
+
+def parse_search_rows(page_html):
+    """
+    검색 결과 HTML에서 보고서 링크가 있는 행만 [(회사명, 보고서명, rcp_no), ...] 로 반환한다 (화면 순서).
+    회사명은 보고서 링크 바로 앞 칸의 텍스트.
+    """
+    rows = []
+    for row in ROW_PATTERN.finditer(page_html):
+        cells = CELL_PATTERN.findall(row.group(1))
+        for k, cell in enumerate(cells[1:], start=1):
+            link = RCP_LINK_PATTERN.search(cell)
+            if link:
+                rows.append((cell_text(cells[k - 1]), cell_text(cell), link.group(1)))
+                break
+    return rows
+
 def get_latest_web_rcp_no(corp_name):
     """
     기업명을 기반으로 DART 웹에서 외부감사보고서의 rcpNo를 크롤링한다.
+    검색 결과 페이지는 검색어(URL) 기준으로 캐시하고, WEB_SEARCH_CACHE_TTL이 지나면 조건부 요청으로 확인한다.
     """
-    search_url = f"https://dart.fss.or.kr/dsap001/search.ax?textCrpNm={corp_name}"
-    print(f"🌐 검색 URL: {search_url}")
-    resp = requests.get(search_url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    search_url = f"{DART_WEB}/dsap001/search.ax?textCrpNm={corp_name}"
+    log.debug("🌐 검색 URL: %s", search_url)
+    with stage("list"):
+        rows = parse_search_rows(get_web_html(search_url, max_age=WEB_SEARCH_CACHE_TTL))
 
     # 입력값 정제
     cleaned_input = clean_corp_name(corp_name)
-    print(f"입력한 기업명: {corp_name}")
-    print(f"정제된 기업명: {cleaned_input}")
-    # '보고서명'에 '감사' 포함된 것 중 가장 최근 rcpNo 찾기
-    links = soup.select("a[href*='rcpNo']")
-    for link in links:
-        title = link.get_text()
-        if "감사" in title:
-            # 기업명 일치 여부 검사 (링크 주변 텍스트에서 추출)
-            parent = link.find_parent("td")
-            if parent:
-                corp_cell = parent.find_previous_sibling("td")
-                if corp_cell:
-                    listed_name = corp_cell.get_text(strip=True)
-                    if cleaned_input in clean_corp_name(listed_name):
-                        href = link["href"]
-                        match = re.search(r"rcpNo=(\d+)", href)
-                        if match:
-                            rcp_no = match.group(1)
-                            print(f"✅ rcpNo 추출 성공: {rcp_no}")
-                            return rcp_no
+    log.debug("입력한 기업명: %s / 정제된 기업명: %s", corp_name, cleaned_input)
+    # '보고서명'에 '감사' 포함된 것 중 가장 최근 rcpNo 찾기 (기업명 일치 여부도 검사)
+    for listed_name, report_nm, rcp_no in rows:
+        if "감사" in report_nm and cleaned_input in clean_corp_name(listed_name):
+            log.debug("✅ rcpNo 추출 성공: %s", rcp_no)
+            return rcp_no
 
     raise Exception("웹에서 외부감사보고서를 찾을 수 없습니다.")
 
 def get_pdf_download_url(rcp_no):
-    viewer_url = f"https://dart.fss.or.kr/dsaf001/main.do?rcpNo={rcp_no}"
-    resp = requests.get(viewer_url)
-    soup = BeautifulSoup(resp.text, "html.parser")
+    # 공시 뷰어 페이지는 바뀌지 않으므로 만료 없이 캐시한다
+    viewer_url = f"{DART_WEB}/dsaf001/main.do?rcpNo={rcp_no}"
+    with stage("viewer"):
+        page_html = get_web_html(viewer_url)
+    soup = BeautifulSoup(page_html, "html.parser", parse_only=SoupStrainer("iframe", id="pdf"))
     iframe = soup.find("iframe", {"id": "pdf"})
     if iframe and "src" in iframe.attrs:
-        return "https://dart.fss.or.kr" + iframe["src"]
+        return DART_WEB + iframe["src"]
     raise Exception("PDF 링크를 찾을 수 없습니다.")
 
 def parse_external_audit_pdf(pdf_url):
-    import fitz  # PyMuPDF
-    resp = requests.get(pdf_url)
-    with open("temp.pdf", "wb") as f:
-        f.write(resp.content)
-
-    doc = fitz.open("temp.pdf")
-    text = ""
-    for page in doc:
-        text += page.get_text()
+    # PDF는 메모리에서 열고 재무제표 페이지만 읽는다
+    with stage("download"):
+        pdf_bytes = IN_FLIGHT.do(("pdf", pdf_url), download_pdf, pdf_url)
 
-    # 숫자 추출 예시
-    result = {}
-    keywords = ["자본총계", "부채총계", "매출액", "영업이익"]
-    for key in keywords:
-        match = re.search(f"{key}.{{0,20}}?([\d,]+)", text)
-        result[key] = match.group(1) if match else "없음"
+    # 숫자 추출 (계정명 뒤 20자 이내의 첫 숫자, 📕 경로와 같이 단위를 반영한 원 단위 값)
+    with stage("parse"):
+        pages = extract_statement_pages(pdf_bytes)
+        found = get_extractor(tuple(TARGET_ACCOUNTS), WEB_VALUE_GAP).extract(pages)
+    return {key: str(found[key].value) if key in found else "없음" for key in TARGET_ACCOUNTS}
 
+def fetch_web_audit(name):
+    """
+    🕸 기업 하나: 웹 검색 → 뷰어 → PDF → 수치. 오류는 결과의 "오류" 칸에 담는다.
+    여러 기업은 fetch_concurrently로 돌리면 되고, 호스트별 요청 제한은 get_web_html/polite_get이 지킨다.
+    """
+    result = {"사업자명": name}
+    with company(name):
+        try:
+            rcp_no = get_latest_web_rcp_no(name)
+            result.update(parse_external_audit_pdf(get_pdf_download_url(rcp_no)))
+        except Exception as e:
+            result["오류"] = str(e)
     return result
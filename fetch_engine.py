@@ -0,0 +1,271 @@
+import datetime
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from dart_http import http_get
+from quota_tracker import get_quota_tracker
+from stage_metrics import count
+from web_cache import get_web_cache
+from dart_settings import (
+    DART_MAX_WORKERS,
+    DART_RATE_PER_MINUTE,
+    DART_DAILY_LIMIT,
+    DART_WEB,
+    DART_WEB_RATE_PER_MINUTE,
+    DART_WEB_MAX_CONCURRENT,
+)
+
+# DART 응답 status 020: 요청 제한 초과
+RATE_LIMIT_STATUS = "020"
+
+
+class DartRateLimitError(Exception):
+    pass
+
+
+class RateLimiter:
+    """
+    분당 호출 수를 제한하는 토큰 버킷 + 일일 호출 한도 카운터.
+    여러 스레드가 같은 객체를 공유한다.
+    used_today_loader를 넘기면 처음 acquire()할 때 한 번 불러 오늘 이미 사용한 호출 수로 시작한다.
+    """
+
+    def __init__(self, per_minute, per_day=None, burst=10, used_today_loader=None):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1, min(burst, per_minute))
+        self.tokens = float(self.capacity)
+        self.per_day = per_day
+        self.day = datetime.date.today()
+        self.used_today = 0
+        self._used_today_loader = used_today_loader
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        today = datetime.date.today()
+        if today != self.day:
+            self.day = today
+            self.used_today = 0
+
+    def acquire(self):
+        """토큰이 생길 때까지 기다렸다가 하나 사용한다. 일일 한도를 넘으면 예외."""
+        while True:
+            with self._lock:
+                if self._used_today_loader is not None:
+                    loader, self._used_today_loader = self._used_today_loader, None
+                    self.used_today = loader()
+                now = time.monotonic()
+                self._refill(now)
+                if self.per_day is not None and self.used_today >= self.per_day:
+                    raise DartRateLimitError(f"일일 호출 한도({self.per_day}건)를 모두 사용했습니다.")
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.used_today += 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """020 응답 등으로 한도 초과가 감지되면 모든 스레드의 호출을 잠시 멈춘다."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+            self.tokens = 0.0
+
+
+# ✅ 프로세스 전체에서 공유하는 호출 제한기
+# 재시작해도 오늘 이미 사용한 호출 수부터 센다 (import만 할 때는 사용량 파일을 열지 않도록 첫 호출 때 읽는다)
+DART_API_LIMITER = RateLimiter(
+    DART_RATE_PER_MINUTE, per_day=DART_DAILY_LIMIT,
+    used_today_loader=lambda: get_quota_tracker().calls_today(),
+)
+DART_WEB_LIMITER = RateLimiter(DART_WEB_RATE_PER_MINUTE)
+
+
+class HostLimiter:
+    """
+    웹 호스트 하나에 대한 요청 제한: 분당 요청 수(RateLimiter) + 동시 요청 수.
+    스레드를 많이 띄워도 같은 호스트에는 max_concurrent개까지만 동시에 요청한다.
+    """
+
+    def __init__(self, rate_limiter, max_concurrent=DART_WEB_MAX_CONCURRENT):
+        self.rate_limiter = rate_limiter
+        self._slots = threading.BoundedSemaphore(max(1, max_concurrent))
+
+    @contextmanager
+    def slot(self):
+        # 자리를 먼저 잡고 토큰을 받아야 기다리는 동안 토큰을 낭비하지 않는다
+        with self._slots:
+            self.rate_limiter.acquire()
+            yield
+
+
+_host_limiters = {}
+_host_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(url):
+    """URL의 호스트별 제한기. dart.fss.or.kr은 DART_WEB_LIMITER와 분당 한도를 함께 쓴다."""
+    host = urlparse(url).netloc
+    with _host_limiters_lock:
+        if host not in _host_limiters:
+            rate_limiter = DART_WEB_LIMITER if host == urlparse(DART_WEB).netloc else RateLimiter(DART_WEB_RATE_PER_MINUTE)
+            _host_limiters[host] = HostLimiter(rate_limiter)
+        return _host_limiters[host]
+
+
+def polite_get(url, **kwargs):
+    """웹 페이지 요청. 호스트별 분당 한도와 동시 요청 수를 지킨다."""
+    with get_host_limiter(url).slot():
+        return http_get(url, **kwargs)
+
+
+class SingleFlight:
+    """
+    같은 키의 요청이 이미 진행 중이면 새로 보내지 않고 그 결과를 같이 받는다.
+    키 단위로 claim()해서 처음 요청한 쪽(owner)만 실제로 호출하고
+    resolve()/fail()로 결과를 넘기면 기다리던 모든 호출자에게 전달된다.
+    끝난 키는 바로 지우므로 결과를 보관하는 캐시는 아니다 (보관은 result_cache/filing_cache).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def claim(self, keys):
+        """반환: (직접 호출해야 하는 키 목록, {이미 진행 중인 키: Future})"""
+        owned = []
+        waiting = {}
+        with self._lock:
+            for key in keys:
+                if key in self._calls:
+                    waiting[key] = self._calls[key]
+                else:
+                    self._calls[key] = Future()
+                    owned.append(key)
+        return owned, waiting
+
+    def resolve(self, key, value):
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_result(value)
+
+    def fail(self, key, error):
+        with self._lock:
+            future = self._calls.pop(key, None)
+        if future is not None:
+            future.set_exception(error)
+
+    def do(self, key, func, *args, **kwargs):
+        """키 하나짜리 요청: 진행 중이면 기다려서 같은 결과(또는 같은 예외)를 받는다."""
+        owned, waiting = self.claim([key])
+        if not owned:
+            return waiting[key].result()
+        try:
+            value = func(*args, **kwargs)
+        except BaseException as e:
+            self.fail(key, e)
+            raise
+        self.resolve(key, value)
+        return value
+
+
+# ✅ 프로세스 전체(같은 서버의 모든 Streamlit 세션)에서 공유하는 진행 중 요청 목록
+# 키는 (엔드포인트, ...) 형태: ("fnlttMultiAcnt", corp_code, 연도, reprt_code, fs_div), ("pdf", rcp_no) 등
+IN_FLIGHT = SingleFlight()
+
+
+def get_dart_json(url, max_retries=4, backoff=5.0):
+    """
+    OpenDART API(JSON) 호출. 호출 전에 제한기 토큰을 받고,
+    status 020이 오면 지수 백오프로 전체 호출을 멈췄다가 다시 시도한다.
+    """
+    for attempt in range(max_retries + 1):
+        DART_API_LIMITER.acquire()
+        response = http_get(url)
+        data = response.json()
+        get_quota_tracker().record(response, data.get("status"))
+        count("api_calls")
+        if data.get("status") != RATE_LIMIT_STATUS:
+            return data
+        if attempt < max_retries:
+            count("retries")
+            DART_API_LIMITER.pause(backoff * (2 ** attempt) * random.uniform(1.0, 1.5))
+    raise DartRateLimitError(data.get("message", "요청 제한 초과"))
+
+
+def get_web_html(url, max_age=None):
+    """
+    DART 웹 페이지 HTML. 캐시가 max_age초 이내면 요청하지 않고,
+    그보다 오래됐으면 ETag/Last-Modified로 조건부 요청을 보내 304면 캐시를 그대로 쓴다.
+    max_age=None이면 만료 없음 (공시 뷰어처럼 바뀌지 않는 페이지).
+    """
+    cache = get_web_cache()
+    cached = cache.get(url) if cache else None
+    if cached and (max_age is None or time.time() - cached.fetched_at < max_age):
+        count("cache_hits")
+        return cached.body
+    return IN_FLIGHT.do(("html", url), _fetch_web_html, url, cached, cache)
+
+
+def _fetch_web_html(url, cached, cache):
+    headers = {}
+    if cached and cached.etag:
+        headers["If-None-Match"] = cached.etag
+    if cached and cached.last_modified:
+        headers["If-Modified-Since"] = cached.last_modified
+
+    response = polite_get(url, headers=headers)
+    if response.status_code == 304 and cached:
+        count("cache_hits")
+        cache.touch(url)
+        return cached.body
+    if response.status_code != 200:
+        raise Exception(f"DART 웹 페이지 요청 실패 (HTTP {response.status_code})")
+    if cache:
+        cache.put(url, response.text, response.headers.get("ETag"), response.headers.get("Last-Modified"))
+    return response.text
+
+
+def fetch_concurrently(func, items, max_workers=DART_MAX_WORKERS, max_pending=None):
+    """
+    items 각각에 func를 스레드 풀에서 실행하고, 끝난 순서대로
+    (입력 순번, 항목, 결과, 예외) 를 돌려준다. 예외가 없으면 예외 자리는 None.
+    한 번에 max_pending개(기본 max_workers*2)만 제출하므로, 소비하는 쪽이 중간에 멈추면
+    (Streamlit 재실행 등) 아직 시작하지 않은 항목은 호출하지 않고 기다리지도 않는다.
+    """
+    max_workers = max(1, max_workers)
+    max_pending = max_pending or max_workers * 2
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    pending = {}
+    remaining = iter(enumerate(items))
+
+    def submit_more():
+        for i, item in itertools.islice(remaining, max_pending - len(pending)):
+            pending[pool.submit(func, item)] = (i, item)
+
+    try:
+        submit_more()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            finished = [(future, pending.pop(future)) for future in done]
+            submit_more()  # 결과를 내보내는 동안에도 스레드가 쉬지 않도록 먼저 채운다
+            for future, (i, item) in finished:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    yield i, item, None, e
+                else:
+                    yield i, item, result, None
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
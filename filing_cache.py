@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from dart_settings import FILING_CACHE_ENABLED, FILING_CACHE_MAX_MB, cache_path
+
+FILING_CACHE_FILE = "filing_cache.sqlite3"
+
+# 재무제표 페이지를 고르는 규칙이 바뀌면 올린다 (이전 규칙으로 고른 페이지는 다시 고른다)
+PAGES_VERSION = 2
+
+
+class FilingCache:
+    """
+    접수번호(rcp_no) 기준 감사보고서 캐시. 공시는 한 번 접수되면 바뀌지 않으므로 만료가 없다.
+    PDF URL, 압축한 PDF 원본, 재무제표 페이지 텍스트를 저장하고,
+    전체 크기가 max_bytes를 넘으면 가장 오래 사용하지 않은 공시부터 지운다 (LRU).
+    """
+
+    def __init__(self, path=None, max_bytes=FILING_CACHE_MAX_MB * 1024 * 1024):
+        self.path = path or cache_path(FILING_CACHE_FILE)
+        self.max_bytes = max_bytes
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS filings (
+                    rcp_no TEXT PRIMARY KEY,
+                    pdf_url TEXT,
+                    pdf BLOB,
+                    pages BLOB,
+                    size INTEGER NOT NULL DEFAULT 0,
+                    last_access REAL NOT NULL
+                )
+            """)
+
+    def _get(self, column, rcp_no):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                f"SELECT {column} FROM filings WHERE rcp_no=?", (rcp_no,)
+            ).fetchone()
+            if row is None or row[0] is None:
+                return None
+            self._conn.execute(
+                "UPDATE filings SET last_access=? WHERE rcp_no=?", (time.time(), rcp_no)
+            )
+            return row[0]
+
+    def _put(self, column, rcp_no, value):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT INTO filings (rcp_no, {column}, last_access) VALUES (?, ?, ?) "
+                f"ON CONFLICT(rcp_no) DO UPDATE SET {column}=excluded.{column}, "
+                f"last_access=excluded.last_access",
+                (rcp_no, value, time.time()),
+            )
+            self._conn.execute(
+                "UPDATE filings SET size=COALESCE(length(pdf), 0) + COALESCE(length(pages), 0) "
+                "WHERE rcp_no=?",
+                (rcp_no,),
+            )
+            self._evict()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM filings").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        expired = []
+        for rcp_no, size in self._conn.execute(
+            "SELECT rcp_no, size FROM filings ORDER BY last_access"
+        ):
+            if total <= self.max_bytes:
+                break
+            expired.append((rcp_no,))
+            total -= size
+        self._conn.executemany("DELETE FROM filings WHERE rcp_no=?", expired)
+
+    def get_pdf_url(self, rcp_no):
+        return self._get("pdf_url", rcp_no)
+
+    def put_pdf_url(self, rcp_no, pdf_url):
+        self._put("pdf_url", rcp_no, pdf_url)
+
+    def get_pdf(self, rcp_no):
+        blob = self._get("pdf", rcp_no)
+        return zlib.decompress(blob) if blob is not None else None
+
+    def put_pdf(self, rcp_no, pdf_bytes):
+        self._put("pdf", rcp_no, zlib.compress(pdf_bytes))
+
+    def get_pages(self, rcp_no, accounts):
+        """
+        저장된 재무제표 페이지 [(페이지 번호, 텍스트), ...].
+        저장할 때 찾던 계정에 이번 계정이 모두 포함되고 같은 규칙(PAGES_VERSION)으로 고른 페이지만 반환한다.
+        """
+        blob = self._get("pages", rcp_no)
+        if blob is None:
+            return None
+        cached = json.loads(zlib.decompress(blob))
+        if cached.get("version") != PAGES_VERSION or not set(accounts) <= set(cached["accounts"]):
+            return None
+        return [tuple(page) for page in cached["pages"]]
+
+    def put_pages(self, rcp_no, accounts, pages):
+        payload = json.dumps({"version": PAGES_VERSION, "accounts": list(accounts), "pages": pages},
+                             ensure_ascii=False)
+        self._put("pages", rcp_no, zlib.compress(payload.encode("utf-8")))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_filing_cache():
+    """공유 캐시 객체. 캐시가 꺼져 있으면 None."""
+    global _cache
+    if not FILING_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = FilingCache()
+        return _cache
@@ -0,0 +1,251 @@
+import datetime
+import re
+import sqlite3
+import threading
+import time
+
+from dart_settings import (
+    FILING_INDEX_ENABLED,
+    FILING_LOOKBACK_DAYS,
+    OPEN_DART_API,
+    cache_path,
+)
+from fetch_engine import get_dart_json
+from stage_metrics import count
+
+FILING_INDEX_FILE = "filing_index.sqlite3"
+
+# list.json 공시유형: F = 외부감사관련 (감사보고서, 연결감사보고서, 결합감사보고서 등)
+AUDIT_PBLNTF_TY = "F"
+AUDIT_REPORT_PATTERN = re.compile(r"감사보고서")
+
+# list.json 한 페이지 최대 건수
+LIST_PAGE_COUNT = 100
+
+# corp_code 없이 조회할 때 DART가 허용하는 최대 기간 (3개월)
+BULK_WINDOW_DAYS = 90
+
+DATE_FORMAT = "%Y%m%d"
+
+
+def to_date(value):
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value), DATE_FORMAT).date()
+
+
+def to_de(value):
+    return to_date(value).strftime(DATE_FORMAT)
+
+
+def iter_filings(api_key, corp_code=None, bgn_de=None, end_de=None, pblntf_ty=None, page_count=LIST_PAGE_COUNT):
+    """
+    list.json 공시 목록을 최신 접수일 순으로 한 건씩 돌려준다.
+    다음 페이지는 앞 페이지를 다 읽은 뒤에만 요청하므로, 원하는 공시를 찾고 멈추면 추가 호출이 없다.
+    """
+    params = {"crtfc_key": api_key, "page_count": page_count, "sort": "date", "sort_mth": "desc"}
+    if corp_code:
+        params["corp_code"] = corp_code
+    if bgn_de:
+        params["bgn_de"] = to_de(bgn_de)
+    if end_de:
+        params["end_de"] = to_de(end_de)
+    if pblntf_ty:
+        params["pblntf_ty"] = pblntf_ty
+
+    page_no = 1
+    while True:
+        query = "&".join(f"{key}={value}" for key, value in {**params, "page_no": page_no}.items())
+        response = get_dart_json(f"{OPEN_DART_API}/list.json?{query}")
+        status = response.get("status")
+        if status == "013":  # 조회된 데이터 없음
+            return
+        if status != "000":
+            raise Exception(f"공시 목록 조회 실패: {response.get('message')}")
+
+        for report in response.get("list", []):
+            yield report
+        if page_no >= int(response.get("total_page") or 1):
+            return
+        page_no += 1
+
+
+def rcept_no_of(report):
+    # list.json 응답 항목명은 rcept_no (예전 코드와 모의 서버는 rcp_no도 사용)
+    return report.get("rcept_no") or report.get("rcp_no")
+
+
+def is_audit_report(report):
+    return bool(AUDIT_REPORT_PATTERN.search(report.get("report_nm", "")))
+
+
+def merge_ranges(ranges):
+    """[(시작일, 종료일), ...] → 겹치거나 이어지는 구간을 합친 정렬된 목록"""
+    merged = []
+    for bgn, end in sorted(ranges):
+        if merged and bgn <= merged[-1][1] + datetime.timedelta(days=1):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((bgn, end))
+    return merged
+
+
+def split_window(bgn, end, days=BULK_WINDOW_DAYS):
+    """기간을 최신 구간부터 days일 이하 구간으로 나눈다."""
+    bgn, end = to_date(bgn), to_date(end)
+    windows = []
+    while end >= bgn:
+        start = max(bgn, end - datetime.timedelta(days=days - 1))
+        windows.append((start, end))
+        end = start - datetime.timedelta(days=1)
+    return windows
+
+
+class FilingIndex:
+    """
+    외부감사관련(F) 공시 목록의 로컬 색인 (SQLite).
+    build()로 기간 전체를 corp_code 없이 한꺼번에 받아 두면, 그 기간의 기업별 감사보고서 조회는 API 호출 없이 끝난다.
+    어떤 기간을 받아 두었는지 함께 저장하므로 색인에 없는 기간만 API로 조회할 수 있다.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_path(FILING_INDEX_FILE)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS filings (
+                    rcept_no TEXT PRIMARY KEY,
+                    corp_code TEXT NOT NULL,
+                    corp_name TEXT,
+                    report_nm TEXT NOT NULL,
+                    rcept_dt TEXT NOT NULL
+                )
+            """)
+            self._conn.execute("CREATE INDEX IF NOT EXISTS filings_corp ON filings (corp_code, rcept_dt)")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS windows (
+                    bgn_de TEXT NOT NULL,
+                    end_de TEXT NOT NULL,
+                    indexed_at REAL NOT NULL,
+                    PRIMARY KEY (bgn_de, end_de)
+                )
+            """)
+
+    def covered_ranges(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT bgn_de, end_de FROM windows").fetchall()
+        return merge_ranges((to_date(bgn), to_date(end)) for bgn, end in rows)
+
+    def segments(self, bgn, end):
+        """
+        기간을 최신 구간부터 (시작일, 종료일, 색인 여부)로 나눈다.
+        색인 여부가 False인 구간은 API로 조회해야 한다.
+        """
+        bgn, end = to_date(bgn), to_date(end)
+        result = []
+        cursor = end
+        for covered_bgn, covered_end in reversed(self.covered_ranges()):
+            if cursor < bgn:
+                break
+            if covered_end < bgn or covered_bgn > cursor:
+                continue
+            if covered_end < cursor:
+                result.append((covered_end + datetime.timedelta(days=1), cursor, False))
+            result.append((max(covered_bgn, bgn), min(covered_end, cursor), True))
+            cursor = covered_bgn - datetime.timedelta(days=1)
+        if cursor >= bgn:
+            result.append((bgn, cursor, False))
+        return result
+
+    def latest_audit(self, corp_code, bgn, end):
+        """색인에서 기간 안 가장 최근 감사보고서의 접수번호 (없으면 None)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT rcept_no FROM filings WHERE corp_code=? AND rcept_dt BETWEEN ? AND ? "
+                "AND report_nm LIKE '%감사보고서%' ORDER BY rcept_dt DESC, rcept_no DESC LIMIT 1",
+                (corp_code, to_de(bgn), to_de(end)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def add(self, reports):
+        rows = [
+            (rcept_no_of(r), r.get("corp_code", ""), r.get("corp_name"), r.get("report_nm", ""), r.get("rcept_dt", ""))
+            for r in reports if rcept_no_of(r)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO filings VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def build(self, api_key, bgn, end=None, progress_callback=None):
+        """
+        bgn~end 기간의 외부감사관련 공시를 3개월 단위로 페이지를 넘기며 모두 받아 색인한다.
+        이미 색인한 구간은 건너뛰고, 오늘 날짜만 다시 받는다 (오늘 색인한 뒤 접수된 공시가 있을 수 있음).
+        progress_callback(완료 구간 수, 전체 구간 수). 반환: 새로 저장한 공시 수
+        """
+        today = datetime.date.today()
+        end = min(to_date(end) if end else today, today)
+        todo = []
+        for seg_bgn, seg_end, covered in self.segments(bgn, end):
+            if not covered:
+                todo.append((seg_bgn, seg_end))
+            elif seg_end >= today:
+                todo.append((today, today))
+        windows = [window for seg_bgn, seg_end in todo for window in split_window(seg_bgn, seg_end)]
+
+        added = 0
+        for done, (window_bgn, window_end) in enumerate(windows, start=1):
+            reports = iter_filings(api_key, bgn_de=window_bgn, end_de=window_end, pblntf_ty=AUDIT_PBLNTF_TY)
+            added += self.add(reports)
+            # 구간을 끝까지 받은 뒤에만 색인한 구간으로 기록한다
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO windows VALUES (?, ?, ?)",
+                    (to_de(window_bgn), to_de(window_end), time.time()),
+                )
+            if progress_callback:
+                progress_callback(done, len(windows))
+        return added
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM filings").fetchone()[0]
+
+
+def find_latest_audit_rcp_no(corp_code, api_key, lookback_days=FILING_LOOKBACK_DAYS, index=None):
+    """
+    최근 lookback_days일 안에서 가장 최근 감사보고서의 접수번호.
+    최신 구간부터 색인된 구간은 로컬에서, 나머지는 list.json(corp_code, 기간, 공시유형 F)으로 찾는다.
+    """
+    if index is None:
+        index = get_filing_index()
+    end = datetime.date.today()
+    bgn = end - datetime.timedelta(days=lookback_days)
+    segments = index.segments(bgn, end) if index is not None else [(bgn, end, False)]
+    for seg_bgn, seg_end, covered in segments:
+        if covered:
+            rcept_no = index.latest_audit(corp_code, seg_bgn, seg_end)
+            if rcept_no:
+                count("cache_hits")
+                return rcept_no
+            continue
+        for report in iter_filings(api_key, corp_code, seg_bgn, seg_end, AUDIT_PBLNTF_TY):
+            if is_audit_report(report):
+                return rcept_no_of(report)
+    return None
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_filing_index():
+    """공유 색인 객체. 색인이 꺼져 있으면 None."""
+    global _index
+    if not FILING_INDEX_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = FilingIndex()
+        return _index
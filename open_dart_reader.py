@@ -1,120 +1,426 @@
+import logging
+
 import pandas as pd
 import re
-import requests
-import zipfile
-import io
-import xml.etree.ElementTree as ET
+
+from account_mapping import as_numeric_targets, assemble_results, map_accounts, map_report_lists
+from corp_registry import CorpRegistry, get_corp_registry, stock_codes_of
+from dart_settings import OPEN_DART_API
+from fetch_engine import IN_FLIGHT, get_dart_json
+from result_cache import get_result_cache
+from stage_metrics import stage
+
+log = logging.getLogger(__name__)
 
 # (주) 등 제거
 def process_corp_info(df):
     cleaned_names = df.iloc[:, 0].str.replace(r"[\(주\)\s]|주식회사", "", regex=True)
-    excluded_names = df.iloc[:, 0].str.extract(r"(\(주\)|주식회사)")[0].dropna().unique().flatten()
+    excluded_names = df.iloc[:, 0].str.extract(r"(\(주\)|주식회사)")[0].dropna().unique().tolist()
     return cleaned_names, excluded_names
 
-# DART 전체 기업 목록에서 사업자명 매칭
+# DART 전체 기업 목록에서 사업자명 매칭 (CorpRegistry 또는 DataFrame)
 def get_corp_code(corp_name, corp_list_df):
+    if isinstance(corp_list_df, CorpRegistry):
+        return corp_list_df.get_corp_code(corp_name)
     match = corp_list_df[corp_list_df["corp_name"] == corp_name]
     if not match.empty:
         return match.iloc[0]["corp_code"]
     return None
 
 # DART에서 재무제표 조회 (fnlttMultiAcnt.json 사용)
-def extract_financial_values(data_list):
-    fs = {}
+# amount_key: thstrm_amount(당기) / frmtrm_amount(전기) / bfefrmtrm_amount(전전기)
+def extract_financial_values(data_list, amount_key="thstrm_amount"):
+    """한 기업의 list 항목 → {계정: 금액(int)}. 매핑 규칙은 account_mapping.ACCOUNT_MAP"""
+    mapped = map_accounts(pd.DataFrame(data_list), amount_key)
+    if mapped.empty:
+        return {}
+    row = mapped.iloc[0]
+    return {account: int(value) for account, value in row.items() if not pd.isna(value)}
+
+# fnlttMultiAcnt.json은 corp_code를 쉼표로 묶어 한 번에 최대 100개까지 조회 가능
+MULTI_ACNT_CHUNK_SIZE = 100
+
+def fetch_multi_acnt(corp_codes, year, report_type, api_key, fs_div):
+    """
+    fnlttMultiAcnt.json 한 번 호출. corp_codes가 여러 개면 쉼표로 묶어 요청한다.
+    """
+    url = (
+        f"{OPEN_DART_API}/fnlttMultiAcnt.json"
+        f"?crtfc_key={api_key}&corp_code={','.join(corp_codes)}&bsns_year={year}"
+        f"&reprt_code={report_type}&fs_div={fs_div}"
+    )
+    return get_dart_json(url)
+
+def split_by_corp_code(data_list, fs_div, corp_codes, stock_codes=None):
+    """
+    묶음 응답의 list를 기업코드별로 나눈다.
+    fnlttMultiAcnt 항목에는 corp_code 대신 stock_code가 있으므로, corp_code가 없으면
+    stock_codes({corp_code: stock_code})로 요청한 기업을 찾는다. 한 기업만 요청했으면 모든 항목이 그 기업 것이다.
+    반환: ({corp_code: list}, 기업을 찾지 못한 항목 수)
+    """
+    by_stock_code = {stock_code: code for code, stock_code in (stock_codes or {}).items()}
+    only_code = corp_codes[0] if len(corp_codes) == 1 else None
+    by_corp = {}
+    unmatched = 0
     for item in data_list:
-        name = item["account_nm"]
-        value = item["thstrm_amount"]
-        if "자본총계" in name or "자본" in name:
-            fs["자본총계"] = value
-        elif "부채총계" in name or "부채" in name:
-            fs["부채총계"] = value
-        elif "매출" in name or "영업수익" in name:
-            fs["매출액"] = value
-        elif "영업이익" in name:
-            fs["영업이익"] = value
-    return fs
-
-def get_dart_report_data(cleaned_names, year, report_type, api_key):
-    # 1. 기업 리스트 가져오기 (ZIP)
-    url = f"https://opendart.fss.or.kr/api/corpCode.xml?crtfc_key={api_key}"
-    response = requests.get(url)
-    with zipfile.ZipFile(io.BytesIO(response.content)) as z:
-        with z.open("CORPCODE.xml") as xml_file:
-            xml_data = xml_file.read().decode("utf-8")
-    root = ET.fromstring(xml_data)
-    corp_list = [
-        {
-            "corp_code": corp.findtext("corp_code"),
-            "corp_name": corp.findtext("corp_name")
-        }
-        for corp in root.iter("list")
-    ]
-    corp_list_df = pd.DataFrame(corp_list)
+        if item.get("fs_div", fs_div) != fs_div:
+            continue
+        code = item.get("corp_code") or by_stock_code.get((item.get("stock_code") or "").strip()) or only_code
+        if code is None:
+            unmatched += 1
+            continue
+        by_corp.setdefault(code, []).append(item)
+    return by_corp, unmatched
+
+def load_multi_acnt(corp_codes, year, report_type, api_key, fs_div, cache=None, registry=None):
+    """
+    캐시를 먼저 보고, 없는 기업만 묶어서 fnlttMultiAcnt를 호출한다.
+    다른 스레드나 다른 세션이 이미 조회 중인 기업은 다시 요청하지 않고 그 응답을 나눠 받는다.
+    묶음 조회 시간과 API 호출, 캐시 적중은 fetch 단계로 기록한다.
+    반환값: ({corp_code: list}, 오류 메시지 또는 None). 결과에 없는 기업은 데이터 없음.
+    """
+    with stage("fetch", companies=len(corp_codes)) as event:
+        if cache is None:
+            cache = get_result_cache()
+
+        hits = cache.get_many(corp_codes, year, report_type, fs_div) if cache else {}
+        event["cache_hits"] += len(hits)
+        by_corp = {code: data_list for code, (_, data_list) in hits.items() if data_list}
+        misses = [code for code in corp_codes if code not in hits]
+        if not misses:
+            return by_corp, None
+
+        keys = {code: ("fnlttMultiAcnt", code, str(year), report_type, fs_div) for code in misses}
+        owned, waiting = IN_FLIGHT.claim(keys.values())
+        owned_codes = [code for code in misses if keys[code] in set(owned)]
+
+        error = None
+        if owned_codes:
+            try:
+                r = fetch_multi_acnt(owned_codes, year, report_type, api_key, fs_div)
+            except BaseException as e:
+                for code in owned_codes:
+                    IN_FLIGHT.fail(keys[code], e)
+                raise
+
+            status = r.get("status")
+            fetched = {}
+            if status not in ("000", "013"):  # 013: 조회된 데이터 없음
+                error = r.get("message", "알 수 없는 오류")
+            else:
+                unmatched = 0
+                if status == "000":
+                    if registry is None:
+                        registry = get_corp_registry(api_key)
+                    corp_list_df = registry.corp_list_df if isinstance(registry, CorpRegistry) else registry
+                    fetched, unmatched = split_by_corp_code(
+                        r.get("list", []), fs_div, owned_codes, stock_codes_of(corp_list_df, owned_codes)
+                    )
+                if unmatched:
+                    log.warning("⚠️ fnlttMultiAcnt 응답 %d건을 요청한 기업과 맞추지 못했습니다.", unmatched)
+                if cache:
+                    # 응답 항목을 다 나누지 못했으면 결과가 없는 기업도 실제로 없는지 알 수 없으므로 저장하지 않는다
+                    cache.put_many(
+                        {code: ("000", fetched[code]) if code in fetched else ("013", [])
+                         for code in owned_codes if code in fetched or not unmatched},
+                        year, report_type, fs_div,
+                    )
+            for code in owned_codes:
+                IN_FLIGHT.resolve(keys[code], (fetched.get(code), error))
+                if code in fetched:
+                    by_corp[code] = fetched[code]
+
+        # 다른 요청이 받아 온 응답을 기다렸다가 합친다
+        for code in misses:
+            if keys[code] in waiting:
+                data_list, shared_error = waiting[keys[code]].result()
+                if data_list:
+                    by_corp[code] = data_list
+                error = error or shared_error
+        return by_corp, error
+
+def build_report_row(name, fs_div, data_list, amount_key="thstrm_amount"):
+    fs = extract_financial_values(data_list, amount_key)
+    return {
+        "사업자명": name,
+        "보고서유형": "연결" if fs_div == "CFS" else "일반",
+        "자본총계": fs.get("자본총계"),
+        "부채총계": fs.get("부채총계"),
+        "매출액": fs.get("매출액"),
+        "영업이익": fs.get("영업이익")
+    }
+
+def get_dart_report_data(cleaned_names, year, report_type, api_key, registry=None):
+    # 1. 기업 리스트는 공유 레지스트리에서 가져온다 (프로세스당 한 번만 로드)
+    if registry is None:
+        registry = get_corp_registry(api_key)
 
     results = []
     for name in cleaned_names[:5]:
-        corp_code = get_corp_code(name, corp_list_df)
+        with stage("resolve", company=name):
+            corp_code = get_corp_code(name, registry)
         if not corp_code:
             results.append({"사업자명": name, "조회결과 없음": "코드 매칭 실패"})
             continue
 
         found = False
         for fs_div in ["CFS", "OFS"]:  # 연결 → 일반 순서로 시도
-            url = (
-                f"https://opendart.fss.or.kr/api/fnlttMultiAcnt.json"
-                f"?crtfc_key={api_key}&corp_code={corp_code}&bsns_year={year}"
-                f"&reprt_code={report_type}&fs_div={fs_div}"
-            )
-            r = requests.get(url).json()   
-            print(f"🔍 기업명: {name}")
-            print(f"📡 요청 URL: {url}")
-            print(f"📦 응답 결과: {r}")
-            if r.get("status") == "000":
-                fs = extract_financial_values(r.get("list", []))
-                results.append({
-                    "사업자명": name,
-                    "보고서유형": "연결" if fs_div == "CFS" else "일반",
-                    "자본총계": fs.get("자본총계", "없음"),
-                    "부채총계": fs.get("부채총계", "없음"),
-                    "매출액": fs.get("매출액", "없음"),
-                    "영업이익": fs.get("영업이익", "없음")
-                })
+            by_corp, _ = load_multi_acnt([corp_code], year, report_type, api_key, fs_div, registry=registry)
+            # 응답 전체 출력은 디버그 로그에서만 (logging.DEBUG일 때만 문자열을 만든다)
+            log.debug("🔍 기업명: %s / 📦 응답 결과: %s", name, by_corp.get(corp_code))
+            if corp_code in by_corp:
+                with stage("map", company=name):
+                    results.append(build_report_row(name, fs_div, by_corp[corp_code]))
                 found = True
                 break  # 연결 성공하면 일반은 안 봐도 됨
 
         if not found:
             results.append({"사업자명": name, "조회결과 없음": "재무정보 없음"})
 
-    return pd.DataFrame(results)
+    return as_numeric_targets(pd.DataFrame(results))
 
+def fetch_report_lists(corp_codes, year, report_type, api_key,
+                       chunk_size=MULTI_ACNT_CHUNK_SIZE, progress_callback=None, registry=None):
+    """
+    기업코드를 chunk_size개씩 묶어 연결(CFS)로 먼저 요청하고,
+    연결 응답에 없던 기업만 모아 일반(OFS)으로 한 번 더 요청한다.
+    반환: ({corp_code: (fs_div, list)}, {corp_code: 오류 메시지})
+    """
+    found = {}
+    errors = {}
+    done = 0
+    for start in range(0, len(corp_codes), chunk_size):
+        chunk = corp_codes[start:start + chunk_size]
+        missing = chunk
+        for fs_div in ["CFS", "OFS"]:  # 연결 → 일반 순서로 시도
+            if not missing:
+                break
+            by_corp, error = load_multi_acnt(missing, year, report_type, api_key, fs_div, registry=registry)
+            for code, items in by_corp.items():
+                found[code] = (fs_div, items)
+            if error:
+                for code in missing:
+                    if code not in found:
+                        errors[code] = error
+                break
+            missing = [code for code in missing if code not in found]
 
-    # 2. 조회 반복
-    results = []
-    for name in cleaned_names[:5]:  # 최대 5개만
-        corp_code = get_corp_code(name, corp_list_df)
-        if not corp_code:
-            results.append({"사업자명": name, "조회결과 없음": "코드 매칭 실패"})
-            continue
+        done += len(chunk)
+        if progress_callback:
+            progress_callback(done, len(corp_codes))
 
-        url = (
-            f"https://opendart.fss.or.kr/api/fnlttMultiAcnt.json"
-            f"?crtfc_key={api_key}&corp_code={corp_code}&bsns_year={year}"
-            f"&reprt_code={report_type}&fs_div=CFS"
-        )
-        r = requests.get(url).json()
+    return found, errors
 
-        if r.get("status") != "000":
-            results.append({"사업자명": name, "조회결과 없음": r.get("message", "알 수 없는 오류")})
-            continue
+def resolve_chunks(names, registry, chunk_size=MULTI_ACNT_CHUNK_SIZE):
+    """
+    기업명 목록 → (기업코드 목록, [(기업코드 묶음, 그 기업들의 입력 순번), ...], 코드 매칭 실패 순번)
+    같은 기업이 여러 번 나와도 한 번만 요청하도록 기업코드 기준으로 묶는다.
+    """
+    with stage("resolve", companies=len(names)):
+        corp_codes = [get_corp_code(name, registry) for name in names]
+    positions = {}
+    for i, code in enumerate(corp_codes):
+        if code:
+            positions.setdefault(code, []).append(i)
+    unique_codes = list(positions)
+    chunks = [
+        (chunk, sorted(i for code in chunk for i in positions[code]))
+        for chunk in (unique_codes[start:start + chunk_size] for start in range(0, len(unique_codes), chunk_size))
+    ]
+    unmatched = [i for i, code in enumerate(corp_codes) if not code]
+    if unmatched:
+        chunks.append(([], unmatched))
+    return corp_codes, chunks
+
+def collect_chunks(chunks):
+    """iter_* 결과를 입력 순서대로 DataFrame 하나로 합친다."""
+    frames = []
+    order = []
+    for row_positions, frame in chunks:
+        frames.append(frame)
+        order += row_positions
+    if not frames:
+        return pd.DataFrame(columns=["사업자명"])
+    result = pd.concat(frames, ignore_index=True)
+    result.index = order
+    return result.sort_index(kind="stable").reset_index(drop=True)
+
+def iter_dart_report_data_batch(cleaned_names, year, report_type, api_key, registry=None,
+                                chunk_size=MULTI_ACNT_CHUNK_SIZE, progress_callback=None):
+    """
+    여러 기업을 묶음 요청으로 조회한다 (fetch_report_lists 참고).
+    기업코드 묶음 하나가 끝날 때마다 (행별 입력 순번, 결과 DataFrame)을 돌려주므로 중간 결과를 바로 저장할 수 있다.
+    코드 매칭에 실패한 기업은 마지막 묶음으로 돌려준다.
+    progress_callback(완료 기업 수, 전체 기업 수)로 진행률을 알린다.
+    """
+    if registry is None:
+        registry = get_corp_registry(api_key)
+
+    names = list(cleaned_names)
+    corp_codes, chunks = resolve_chunks(names, registry, chunk_size)
+    total_codes = sum(len(chunk) for chunk, _ in chunks)
+    done = 0
+    for chunk, chunk_positions in chunks:
+        found, errors = fetch_report_lists(chunk, year, report_type, api_key, chunk_size, registry=registry)
+
+        # 묶음 응답을 한 번에 매핑하고 요청 목록에 붙인다
+        with stage("map", companies=len(chunk_positions)):
+            missing = [code for code in chunk if code not in found]
+            failures = pd.DataFrame({
+                "corp_code": missing,
+                "조회결과 없음": [errors.get(code, "재무정보 없음") for code in missing],
+            })
+            requests_df = pd.DataFrame({
+                "사업자명": [names[i] for i in chunk_positions],
+                "corp_code": [corp_codes[i] for i in chunk_positions],
+            })
+            frame = assemble_results(requests_df, map_report_lists(found).reset_index(), failures, ["corp_code"])
+
+        done += len(chunk)
+        if progress_callback:
+            progress_callback(done, total_codes)
+        yield chunk_positions, frame
+
+def get_dart_report_data_batch(cleaned_names, year, report_type, api_key, registry=None,
+                               chunk_size=MULTI_ACNT_CHUNK_SIZE, progress_callback=None):
+    """iter_dart_report_data_batch 결과 전체를 입력 순서대로 반환한다."""
+    return collect_chunks(iter_dart_report_data_batch(
+        cleaned_names, year, report_type, api_key, registry, chunk_size, progress_callback
+    ))
+
+
+# ✅ 여러 연도 조회: 응답 하나에 담긴 당기/전기/전전기 금액을 모두 사용
+PERIOD_AMOUNT_KEYS = ["thstrm_amount", "frmtrm_amount", "bfefrmtrm_amount"]
+
+def plan_multi_year_queries(start_year, end_year, report_type):
+    """
+    연도 범위를 덮는 최소 조회 계획. 반환: [(조회 연도, [(금액 항목, 해당 연도), ...]), ...]
+    사업보고서(11011)는 응답 하나가 당기·전기·전전기 3개 연도를 담으므로 3년 간격으로 조회한다.
+    반기/분기 보고서의 전기 값은 재무상태표가 전기말 기준이라 같은 기간 비교가 안 되므로 연도마다 조회한다.
+    """
+    span = len(PERIOD_AMOUNT_KEYS) if report_type == "11011" else 1
+    plan = []
+    year = int(end_year)
+    while year >= int(start_year):
+        covered = [
+            (amount_key, year - offset)
+            for offset, amount_key in enumerate(PERIOD_AMOUNT_KEYS[:span])
+            if year - offset >= int(start_year)
+        ]
+        plan.append((year, covered))
+        year -= span
+    return plan
+
+def fetch_multi_year(corp_codes, plans, api_key, registry=None):
+    """
+    기업코드 묶음 하나의 조회 계획 전체를 실행한다.
+    반환: (매핑 결과 DataFrame 목록, 실패 목록) — 키는 corp_code, 보고서코드, 연도
+    """
+    mapped_frames = []
+    failures = []
+    for report_type, (query_year, covered) in plans:
+        covered_years = [year for _, year in covered]
+
+        def fail(code, years, message):
+            failures.extend(
+                {"corp_code": code, "보고서코드": report_type, "연도": year, "조회결과 없음": message}
+                for year in years
+            )
+
+        # 조회 연도 보고서가 없는 기업만 1년 전, 2년 전 보고서로 남은 연도를 채운다
+        todo = corp_codes
+        for report_year in range(query_year, min(covered_years) - 1, -1):
+            if not todo:
+                break
+            needed = [year for year in covered_years if year <= report_year]
+            found, errors = fetch_report_lists(todo, report_year, report_type, api_key, registry=registry)
+            with stage("map", companies=len(found) * len(needed)):
+                for year in needed:
+                    mapped = map_report_lists(found, PERIOD_AMOUNT_KEYS[report_year - year]).reset_index()
+                    mapped_frames.append(mapped.assign(보고서코드=report_type, 연도=year))
+            later = [year for year in covered_years if year > report_year]
+            remaining = []
+            for code in todo:
+                if code in found:
+                    fail(code, later, "재무정보 없음")
+                elif code in errors:
+                    fail(code, later, "재무정보 없음")
+                    fail(code, needed, errors[code])
+                else:
+                    remaining.append(code)
+            todo = remaining
+        for code in todo:
+            fail(code, covered_years, "재무정보 없음")
+    return mapped_frames, failures
+
+def iter_dart_multi_year_data(cleaned_names, start_year, end_year, report_types, api_key,
+                              registry=None, chunk_size=MULTI_ACNT_CHUNK_SIZE, progress_callback=None):
+    """
+    여러 연도 × 보고서 유형 조회 (기업·보고서·연도별 한 행).
+    기업코드 묶음마다 조회 계획 전체를 끝내고 (행별 입력 순번, 결과 DataFrame)을 돌려준다.
+    조회 연도 보고서가 없는 기업은 그 기업만 이전 연도 보고서로 다시 조회해 남은 연도를 채운다.
+    progress_callback(완료 기업 수, 전체 기업 수)로 진행률을 알린다.
+    """
+    if registry is None:
+        registry = get_corp_registry(api_key)
+
+    names = list(cleaned_names)
+    corp_codes, chunks = resolve_chunks(names, registry, chunk_size)
+    plans = [(report_type, query) for report_type in report_types
+             for query in plan_multi_year_queries(start_year, end_year, report_type)]
+    years = range(int(start_year), int(end_year) + 1)
+    keys = ["corp_code", "보고서코드", "연도"]
+
+    total_codes = sum(len(chunk) for chunk, _ in chunks)
+    done = 0
+    for chunk, chunk_positions in chunks:
+        mapped_frames, failures = fetch_multi_year(chunk, plans, api_key, registry)
+
+        rows = [(i, report_type, year) for i in chunk_positions for report_type in report_types for year in years]
+        requests_df = pd.DataFrame(
+            [(names[i], corp_codes[i], report_type, year) for i, report_type, year in rows],
+            columns=["사업자명"] + keys,
+        )
+        mapped = pd.concat(mapped_frames, ignore_index=True) if mapped_frames else pd.DataFrame(columns=keys)
+        failures = pd.DataFrame(failures, columns=keys + ["조회결과 없음"])
+        frame = assemble_results(
+            requests_df,
+            mapped.astype({"연도": "int64"}),
+            failures.astype({"연도": "int64"}),
+            keys,
+        )
 
-        fs = {item["account_nm"]: item["thstrm_amount"] for item in r.get("list", [])}
+        done += len(chunk)
+        if progress_callback:
+            progress_callback(done, total_codes)
+        yield [i for i, _, _ in rows], frame
 
-        results.append({
-            "사업자명": name,
-            "자본총계": fs.get("자본총계", "없음"),
-            "부채총계": fs.get("부채총계", "없음"),
-            "매출액": fs.get("매출액", "없음"),
-            "영업이익": fs.get("영업이익", "없음")
-        })
+def get_dart_multi_year_data(cleaned_names, start_year, end_year, report_types, api_key,
+                             registry=None, shape="long", progress_callback=None):
+    """
+    iter_dart_multi_year_data 결과 전체를 입력 순서대로 반환한다.
+    shape="long": 기업·보고서·연도별 한 행 / shape="wide": 기업별 한 행 ("2023 매출액" 같은 열)
+    """
+    long_df = collect_chunks(iter_dart_multi_year_data(
+        cleaned_names, start_year, end_year, report_types, api_key, registry, progress_callback=progress_callback
+    ))
+    if shape != "wide" or long_df.empty:
+        return long_df
+    return to_wide_table(long_df)
 
-    return pd.DataFrame(results)
+def to_wide_table(long_df):
+    """
+    기업·보고서별 한 행, (연도 계정) 열로 펼친다.
+    long_df는 get_dart_multi_year_data 결과처럼 입력 순서대로, 기업·보고서마다 연도 오름차순으로 나온 행이어야 한다.
+    같은 기업명이 여러 번 입력돼도 합치지 않도록 이름 대신 입력 위치(연도가 다시 작아지는 곳에서 새 행)로 펼친다.
+    """
+    value_columns = [c for c in long_df.columns if c not in ("사업자명", "보고서코드", "연도")]
+    years = long_df["연도"].astype("int64")
+    row_no = (years.diff().fillna(-1) <= 0).cumsum().rename("행")
+    wide = long_df.assign(행=row_no.to_numpy()).pivot_table(
+        index=["행", "사업자명", "보고서코드"], columns="연도", values=value_columns,
+        aggfunc="first", sort=False,
+    )
+    wide.columns = [f"{year} {column}" for column, year in wide.columns]
+    wide = wide[sorted(wide.columns, key=lambda c: (int(c.split(" ", 1)[0]), value_columns.index(c.split(" ", 1)[1])))]
+    return wide.reset_index().drop(columns="행")
@@ -0,0 +1,152 @@
+import atexit
+import datetime
+import sqlite3
+import threading
+import time
+
+from dart_settings import DART_DAILY_LIMIT, cache_path
+
+QUOTA_FILE = "api_quota.sqlite3"
+KEEP_DAYS = 7
+
+
+def _empty_day():
+    return {"calls": 0, "status": {}, "remaining": None, "limit": None}
+
+
+class QuotaTracker:
+    """
+    앱이 이미 받은 OpenDART 응답에서 호출 수, status 코드, x-ratelimit-* 헤더를 기록한다.
+    사용량 확인을 위한 별도 요청은 보내지 않으며, 일별 집계는 로컬 SQLite에 저장한다.
+    저장할 때는 이 프로세스의 증가분만 더하므로 여러 프로세스(배치 조각, 앱)가 같은 파일을 써도 호출 수가 합산된다.
+    """
+
+    def __init__(self, path=None, save_interval=2.0):
+        self.path = path or cache_path(QUOTA_FILE)
+        self.save_interval = save_interval
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._last_saved = 0.0
+        self._pending = {}  # 아직 저장하지 않은 이 프로세스의 증가분 {날짜: 집계}
+        self._saved = {}    # 마지막으로 읽은 저장 값 (다른 프로세스 포함) {날짜: 집계}
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS quota_days (
+                    day TEXT PRIMARY KEY,
+                    calls INTEGER NOT NULL,
+                    remaining TEXT,
+                    limit_value TEXT
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS quota_status (
+                    day TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (day, status)
+                )
+            """)
+            self._load(datetime.date.today().isoformat())
+
+    def _load(self, key):
+        row = self._conn.execute(
+            "SELECT calls, remaining, limit_value FROM quota_days WHERE day=?", (key,)
+        ).fetchone()
+        day = _empty_day()
+        if row:
+            day["calls"], day["remaining"], day["limit"] = row
+        day["status"] = dict(self._conn.execute(
+            "SELECT status, count FROM quota_status WHERE day=?", (key,)
+        ).fetchall())
+        self._saved = {key: day}
+
+    def _today(self):
+        """오늘 집계 (저장된 값 + 아직 저장하지 않은 증가분)"""
+        key = datetime.date.today().isoformat()
+        saved = self._saved.get(key, _empty_day())
+        pending = self._pending.get(key, _empty_day())
+        status = dict(saved["status"])
+        for code, n in pending["status"].items():
+            status[code] = status.get(code, 0) + n
+        return {
+            "calls": saved["calls"] + pending["calls"],
+            "status": status,
+            "remaining": pending["remaining"] if pending["remaining"] is not None else saved["remaining"],
+            "limit": pending["limit"] if pending["limit"] is not None else saved["limit"],
+        }
+
+    def record(self, response=None, status=None):
+        """OpenDART 호출 1건 기록. response 헤더와 응답 status 코드를 함께 남긴다."""
+        with self._lock:
+            day = self._pending.setdefault(datetime.date.today().isoformat(), _empty_day())
+            day["calls"] += 1
+            if status:
+                day["status"][status] = day["status"].get(status, 0) + 1
+            if response is not None:
+                remaining = response.headers.get("x-ratelimit-remaining")
+                limit = response.headers.get("x-ratelimit-limit")
+                if remaining is not None:
+                    day["remaining"] = remaining
+                if limit is not None:
+                    day["limit"] = limit
+            if time.monotonic() - self._last_saved > self.save_interval:
+                self._save()
+
+    def calls_today(self):
+        with self._lock:
+            return self._today()["calls"]
+
+    def summary(self):
+        """
+        오늘 사용량 {"calls", "status", "remaining", "limit"}. 다른 프로세스가 저장한 호출도 포함한다.
+        헤더로 받은 값이 없으면 remaining/limit은 설정된 일일 한도 기준으로 계산한다.
+        """
+        with self._lock:
+            self._load(datetime.date.today().isoformat())
+            day = self._today()
+        if day["limit"] is None:
+            day["limit"] = DART_DAILY_LIMIT
+            day["remaining"] = max(DART_DAILY_LIMIT - day["calls"], 0)
+        return day
+
+    def flush(self):
+        with self._lock:
+            self._save()
+
+    def _save(self):
+        # 증가분만 더하고(calls = calls + ?) 헤더 값은 새로 받은 것만 덮어쓴다
+        with self._conn:
+            for key, day in self._pending.items():
+                self._conn.execute(
+                    "INSERT INTO quota_days (day, calls, remaining, limit_value) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (day) DO UPDATE SET calls = calls + excluded.calls, "
+                    "remaining = COALESCE(excluded.remaining, remaining), "
+                    "limit_value = COALESCE(excluded.limit_value, limit_value)",
+                    (key, day["calls"], day["remaining"], day["limit"]),
+                )
+                self._conn.executemany(
+                    "INSERT INTO quota_status (day, status, count) VALUES (?, ?, ?) "
+                    "ON CONFLICT (day, status) DO UPDATE SET count = count + excluded.count",
+                    [(key, code, n) for code, n in day["status"].items()],
+                )
+            # 최근 KEEP_DAYS일만 남긴다
+            oldest = (datetime.date.today() - datetime.timedelta(days=KEEP_DAYS - 1)).isoformat()
+            self._conn.execute("DELETE FROM quota_days WHERE day < ?", (oldest,))
+            self._conn.execute("DELETE FROM quota_status WHERE day < ?", (oldest,))
+        self._pending = {}
+        self._load(datetime.date.today().isoformat())
+        self._last_saved = time.monotonic()
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_quota_tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = QuotaTracker()
+            atexit.register(_tracker.flush)
+        return _tracker
@@ -0,0 +1,106 @@
+import datetime
+import json
+import sqlite3
+import threading
+import time
+
+from dart_settings import RESULT_CACHE_ENABLED, cache_path
+
+RESULT_CACHE_FILE = "fnltt_cache.sqlite3"
+
+# TTL (초). None이면 만료 없음
+CURRENT_YEAR_TTL = 24 * 3600          # 올해(진행 중인 연도) 데이터
+CURRENT_YEAR_NEGATIVE_TTL = 6 * 3600  # 올해/작년 "데이터 없음" (공시 전일 수 있음)
+PAST_YEAR_NEGATIVE_TTL = 30 * 24 * 3600
+
+
+def result_ttl(year, has_data):
+    """
+    지난 연도의 재무제표는 바뀌지 않으므로 영구 보관한다.
+    "데이터 없음"은 늦게 공시될 수 있어 작년까지는 짧게, 그 이전은 한 달 보관한다.
+    """
+    current_year = datetime.date.today().year
+    year = int(year)
+    if has_data:
+        return None if year < current_year else CURRENT_YEAR_TTL
+    return PAST_YEAR_NEGATIVE_TTL if year < current_year - 1 else CURRENT_YEAR_NEGATIVE_TTL
+
+
+class ResultCache:
+    """
+    fnlttMultiAcnt 응답을 (corp_code, 연도, 보고서코드, fs_div) 단위로 저장하는 SQLite 캐시.
+    list 원본과 013("조회된 데이터 없음") 같은 음성 결과를 함께 저장한다.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_path(RESULT_CACHE_FILE)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS fnltt (
+                    corp_code TEXT NOT NULL,
+                    bsns_year TEXT NOT NULL,
+                    reprt_code TEXT NOT NULL,
+                    fs_div TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    expires_at REAL,
+                    PRIMARY KEY (corp_code, bsns_year, reprt_code, fs_div)
+                )
+            """)
+
+    def get_many(self, corp_codes, year, reprt_code, fs_div):
+        """
+        캐시에 있는 기업만 {corp_code: (status, list)} 로 반환한다. 만료된 항목은 제외.
+        """
+        hits = {}
+        now = time.time()
+        with self._lock:
+            for code in corp_codes:
+                row = self._conn.execute(
+                    "SELECT status, payload FROM fnltt "
+                    "WHERE corp_code=? AND bsns_year=? AND reprt_code=? AND fs_div=? "
+                    "AND (expires_at IS NULL OR expires_at > ?)",
+                    (code, str(year), reprt_code, fs_div, now),
+                ).fetchone()
+                if row:
+                    hits[code] = (row[0], json.loads(row[1]))
+        return hits
+
+    def put_many(self, entries, year, reprt_code, fs_div):
+        """entries: {corp_code: (status, list)}"""
+        now = time.time()
+        rows = []
+        for code, (status, data_list) in entries.items():
+            ttl = result_ttl(year, bool(data_list))
+            rows.append((
+                code, str(year), reprt_code, fs_div, status,
+                json.dumps(data_list, ensure_ascii=False),
+                now, None if ttl is None else now + ttl,
+            ))
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fnltt VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM fnltt")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """공유 캐시 객체. 캐시가 꺼져 있으면 None."""
+    global _cache
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResultCache()
+        return _cache
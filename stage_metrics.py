@@ -0,0 +1,183 @@
+import csv
+import io
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+
+# 처리 단계 (표시 순서)
+STAGE_LABELS = {
+    "resolve": "기업코드 매칭",
+    "list": "공시 목록 조회",
+    "fetch": "재무제표 API",
+    "viewer": "뷰어 페이지",
+    "download": "PDF 다운로드",
+    "parse": "PDF 분석",
+    "map": "계정 매핑",
+}
+
+# 단계 기록 하나의 항목 (내보내기 CSV 열 순서)
+EVENT_FIELDS = ["time", "company", "stage", "seconds", "companies", "bytes",
+                "requests", "api_calls", "retries", "cache_hits", "error"]
+COUNTER_FIELDS = ["seconds", "companies", "bytes", "requests", "api_calls", "retries", "cache_hits"]
+
+# 보관하는 단계 기록 수 (넘으면 오래된 것부터 버린다. 단계별 합계는 계속 누적)
+MAX_EVENTS = 200_000
+
+_local = threading.local()
+
+
+def _stage_stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+def current_company():
+    return getattr(_local, "company", "")
+
+
+@contextmanager
+def company(name):
+    """이 스레드에서 기록하는 단계를 name 기업의 것으로 표시한다."""
+    previous = current_company()
+    _local.company = name
+    try:
+        yield
+    finally:
+        _local.company = previous
+
+
+def count(field, n=1):
+    """현재 진행 중인 단계 기록의 항목을 늘린다 (진행 중인 단계가 없으면 무시)."""
+    stack = _stage_stack()
+    if stack:
+        stack[-1][field] += n
+
+
+def record_http(response):
+    """http_get 응답 1건: 요청 수, 받은 bytes, urllib3 재시도 횟수"""
+    stack = _stage_stack()
+    if not stack:
+        return
+    event = stack[-1]
+    event["requests"] += 1
+    event["bytes"] += len(response.content)
+    retries = getattr(getattr(response, "raw", None), "retries", None)
+    if retries is not None and retries.history:
+        event["retries"] += len(retries.history)
+
+
+class StageMetrics:
+    """
+    기업별·단계별 소요 시간, 받은 bytes, 요청/API 호출 수, 재시도, 캐시 적중을 모은다.
+    스레드마다 진행 중인 단계를 따로 두므로 여러 스레드가 같은 객체를 써도 된다.
+    """
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self._events = deque(maxlen=max_events)
+        self._totals = {}
+        self._lock = threading.Lock()
+
+    def _new_event(self, name, company_name, companies):
+        event = dict.fromkeys(COUNTER_FIELDS, 0)
+        event.update(
+            time=time.time(), stage=name, companies=companies, error="",
+            company=current_company() if company_name is None else company_name,
+        )
+        return event
+
+    @contextmanager
+    def stage(self, name, company=None, companies=1):
+        """
+        with metrics.stage("download") as event: ...
+        블록 안의 http_get/get_dart_json 호출은 자동으로 이 단계에 집계된다.
+        여러 기업을 한 번에 처리하는 단계(묶음 조회 등)는 companies에 기업 수를 넘긴다.
+        """
+        event = self._new_event(name, company, companies)
+        stack = _stage_stack()
+        stack.append(event)
+        started = time.perf_counter()
+        try:
+            yield event
+        except Exception as e:
+            event["error"] = str(e)[:200]
+            raise
+        finally:
+            event["seconds"] = time.perf_counter() - started
+            stack.pop()
+            self.add(event)
+
+    def record(self, name, company=None, companies=1, **fields):
+        """이미 측정한 값이나 캐시 적중처럼 시간이 걸리지 않은 단계를 기록한다."""
+        event = self._new_event(name, company, companies)
+        event.update(fields)
+        self.add(event)
+
+    def add(self, event):
+        with self._lock:
+            self._events.append(event)
+            totals = self._totals.setdefault(event["stage"], dict.fromkeys(COUNTER_FIELDS + ["events", "errors"], 0))
+            for field in COUNTER_FIELDS:
+                totals[field] += event[field]
+            totals["events"] += 1
+            totals["errors"] += bool(event["error"])
+
+    def summary(self):
+        """단계별 합계 DataFrame (단계, 건수, 기업 수, 합계/평균 시간, bytes, 요청, API 호출, 재시도, 캐시 적중, 오류)"""
+        with self._lock:
+            totals = {name: dict(values) for name, values in self._totals.items()}
+        rows = []
+        for name in sorted(totals, key=lambda s: list(STAGE_LABELS).index(s) if s in STAGE_LABELS else len(STAGE_LABELS)):
+            t = totals[name]
+            rows.append({
+                "단계": STAGE_LABELS.get(name, name),
+                "건수": t["events"],
+                "기업 수": t["companies"],
+                "합계(초)": round(t["seconds"], 2),
+                "평균(ms)": round(t["seconds"] / t["events"] * 1000, 1) if t["events"] else 0.0,
+                "받은 MB": round(t["bytes"] / 1_000_000, 2),
+                "요청": t["requests"],
+                "API 호출": t["api_calls"],
+                "재시도": t["retries"],
+                "캐시 적중": t["cache_hits"],
+                "오류": t["errors"],
+            })
+        return pd.DataFrame(rows)
+
+    def events(self):
+        with self._lock:
+            return list(self._events)
+
+    def to_csv(self):
+        """기업·단계별 기록 전체를 CSV 문자열로 (오프라인 분석용)"""
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EVENT_FIELDS)
+        writer.writeheader()
+        writer.writerows(self.events())
+        return buffer.getvalue()
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._totals.clear()
+
+
+# ✅ 프로세스 전체에서 공유하는 집계 (같은 서버의 모든 세션 포함)
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_stage_metrics():
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = StageMetrics()
+        return _metrics
+
+
+def stage(name, company=None, companies=1):
+    """get_stage_metrics().stage() 단축 함수"""
+    return get_stage_metrics().stage(name, company, companies)
@@ -0,0 +1,72 @@
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from dart_settings import WEB_CACHE_ENABLED, cache_path
+
+WEB_CACHE_FILE = "web_cache.sqlite3"
+
+CachedPage = namedtuple("CachedPage", ["body", "etag", "last_modified", "fetched_at"])
+
+
+class WebPageCache:
+    """
+    DART 웹 페이지(검색 결과, 공시 뷰어) HTML 캐시. 키는 검색어를 포함한 요청 URL.
+    본문은 압축해 저장하고, 조건부 요청에 쓸 ETag/Last-Modified를 함께 보관한다.
+    얼마나 오래 믿을지는 호출하는 쪽이 max_age로 정한다 (fetch_engine.get_web_html).
+    """
+
+    def __init__(self, path=None):
+        self.path = path or cache_path(WEB_CACHE_FILE)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS pages (
+                    url TEXT PRIMARY KEY,
+                    body BLOB NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT,
+                    fetched_at REAL NOT NULL
+                )
+            """)
+
+    def get(self, url):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE url=?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        body, etag, last_modified, fetched_at = row
+        return CachedPage(zlib.decompress(body).decode("utf-8"), etag, last_modified, fetched_at)
+
+    def put(self, url, body, etag=None, last_modified=None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, etag, last_modified, fetched_at) VALUES (?, ?, ?, ?, ?)",
+                (url, zlib.compress(body.encode("utf-8")), etag, last_modified, time.time()),
+            )
+
+    def touch(self, url):
+        """304(변경 없음) 응답을 받으면 확인 시각만 갱신한다."""
+        with self._lock, self._conn:
+            self._conn.execute("UPDATE pages SET fetched_at=? WHERE url=?", (time.time(), url))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_web_cache():
+    """공유 캐시 객체. 캐시가 꺼져 있으면 None."""
+    global _cache
+    if not WEB_CACHE_ENABLED:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = WebPageCache()
+        return _cache